@@ -1340,33 +1340,9 @@ async def {{operationId}}(
   context: ActionTurnContext[Dict[str, Any]],
   state: AppTurnState,
 ):
-  parameters = context.data
-  path = parameters.get("path", {})
-  body = parameters.get("body", None)
-  query = parameters.get("query", {})
-  resp = client.{{operationId}}(**path, json=body, _headers={}, _params=query, _cookies={})
-
-  if resp.status_code != 200:
-    await context.send_activity(resp.reason)
-  else:
-    card_template_path = os.path.join(current_dir, 'adaptiveCards/{{operationId}}.json')
-    if not os.path.exists(card_template_path):
-      json_resoponse_str = resp.text
-      await context.send_activity(json_resoponse_str)
-    else:
-      with open(card_template_path) as card_template_file:
-        adaptive_card_template = card_template_file.read()
-
-      renderer = AdaptiveCardRenderer(adaptive_card_template)
-
-      json_resoponse_str = resp.text
-      rendered_card_str = renderer.render(json_resoponse_str)
-      rendered_card_json = json.loads(rendered_card_str)
-      card = CardFactory.adaptive_card(rendered_card_json)
-      message = MessageFactory.attachment(card)
-      
-      await context.send_activity(message)
-  return "success"
+  # The call was sent with the other API calls of the plan when it was ready,
+  # its outcome is returned to the model and its result sent to the user after the turn
+  return await run_api_action(context, "{{operationId}}")
   `,
   cs: `
         [Action("{{operationId}}")]
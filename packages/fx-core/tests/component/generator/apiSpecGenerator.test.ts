@@ -1101,6 +1101,9 @@ describe("updateForCustomApi", async () => {
         expect(data).to.contains("getHello");
       } else if (file == path.join("path", "src", "bot.py")) {
         expect(data).to.contains(`@bot_app.ai.action("getHello")`);
+        expect(data).to.contains(`async def getHello(`);
+        expect(data).to.contains(`return await run_api_action(context, "getHello")`);
+        expect(data).not.to.contains(`return "success"`);
         expect(data).not.to.contains("{{");
         expect(data).not.to.contains("# Replace with action code");
       }
@@ -5,7 +5,7 @@ import json
 from typing import Any, Dict, Optional
 from dataclasses import asdict
 
-from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.core import TurnContext
 from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.ai import AIOptions
 from teams.ai.planners import AssistantsPlanner, OpenAIAssistantsOptions, AzureOpenAIAssistantsOptions
@@ -13,6 +13,7 @@ from teams.state import TurnState
 from teams.feedback_loop_data import FeedbackLoopData
 
 from config import Config
+from sqlite_storage import SqliteStorage
 
 config = Config()
 
@@ -32,7 +33,7 @@ planner = AssistantsPlanner[TurnState](
 {{/useAzureOpenAI}}
 
 # Define storage and application
-storage = MemoryStorage()
+storage = SqliteStorage(config.STATE_DB_PATH)
 bot_app = Application[TurnState](
     ApplicationOptions(
         bot_app_id=config.APP_ID,
@@ -5,7 +5,7 @@ import json
 from typing import Any, Dict, Optional
 from dataclasses import asdict
 
-from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.core import TurnContext
 from state import AppTurnState
 from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.ai import AIOptions
@@ -17,6 +17,7 @@ from teams.state import TurnState
 from teams.feedback_loop_data import FeedbackLoopData
 
 from config import Config
+from sqlite_storage import SqliteStorage
 
 config = Config()
 
@@ -48,7 +49,7 @@ planner = ActionPlanner(
 )
 
 # Define storage and application
-storage = MemoryStorage()
+storage = SqliteStorage(config.STATE_DB_PATH)
 bot_app = Application[AppTurnState](
     ApplicationOptions(
         bot_app_id=config.APP_ID,
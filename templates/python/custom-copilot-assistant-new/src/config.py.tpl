@@ -4,6 +4,7 @@ Licensed under the MIT License.
 """
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -15,6 +16,12 @@ class Config:
     PORT = 3978
     APP_ID = os.environ.get("BOT_ID", "")
     APP_PASSWORD = os.environ.get("BOT_PASSWORD", "")
+    # SQLite database storing the bot state. It must be on a local disk, not on a network share such as
+    # /home on Azure App Service. The default in the temp folder suits local debugging only: App Service
+    # wipes it when the app restarts, so conversations lose their state. In production, set STATE_DB_PATH
+    # to a file on a local disk that persists across restarts, or replace SqliteStorage with a shared
+    # storage such as Azure Blob Storage, which is also needed to run several instances.
+    STATE_DB_PATH = os.environ.get("STATE_DB_PATH", os.path.join(tempfile.gettempdir(), "bot-state", "state.db"))
     {{#useOpenAI}}
     OPENAI_API_KEY = os.environ["OPENAI_API_KEY"] # OpenAI API key
     OPENAI_MODEL_NAME='gpt-3.5-turbo' # OpenAI model name. You can use any other model name from OpenAI.
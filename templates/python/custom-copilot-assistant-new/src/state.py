@@ -3,10 +3,14 @@ Copyright (c) Microsoft Corporation. All rights reserved.
 Licensed under the MIT License.
 """
 
+import json
 from typing import Any, Dict, Optional
 
-from botbuilder.core import Storage, TurnContext
-from teams.state import TurnState, ConversationState, UserState, TempState
+from botbuilder.core import Storage, StoreItem, TurnContext
+from teams.state import TurnState, ConversationState, UserState, TempState, State, todict
+
+# the application loads the turn state more than once per turn, the first load is kept here
+_TURN_STATE_KEY = "AppTurnState"
 
 
 class AppConversationState(ConversationState):
@@ -23,8 +27,69 @@ class AppTurnState(TurnState[AppConversationState, UserState, TempState]):
 
     @classmethod
     async def load(cls, context: TurnContext, storage: Optional[Storage] = None) -> "AppTurnState":
-        return cls(
-            conversation=await AppConversationState.load(context, storage),
-            user=await UserState.load(context, storage),
+        loaded = context.turn_state.get(_TURN_STATE_KEY)
+        if loaded is not None:
+            return loaded
+
+        # without storage, the scopes are created empty with their storage keys
+        conversation = await AppConversationState.load(context)
+        user = await UserState.load(context)
+        if storage:
+            # a single read for all the scopes
+            data = await storage.read([conversation.__key__, user.__key__])
+            conversation = AppConversationState(**_stored(data, conversation.__key__))
+            user = UserState(**_stored(data, user.__key__))
+
+        state = cls(
+            conversation=conversation,
+            user=user,
             temp=await TempState.load(context, storage),
-        )
\ No newline at end of file
+        )
+        state._snapshots = {scope.__key__: _snapshot(scope) for scope in (conversation, user)}
+        context.turn_state[_TURN_STATE_KEY] = state
+        return state
+
+    async def save(self, context: TurnContext, storage: Optional[Storage] = None) -> None:
+        """Writes the scopes that changed since they were loaded, in a single write."""
+        if not storage:
+            return
+
+        snapshots = getattr(self, "_snapshots", {})
+        deleted = list(self.__deleted__)
+        changes = {}
+        for scope in self.values():
+            if not isinstance(scope, State) or scope.__key__ == "":
+                continue
+            deleted.extend(scope.__deleted__)
+            snapshot = _snapshot(scope)
+            if snapshot != snapshots.get(scope.__key__):
+                data = scope.copy()
+                data.pop("__key__", None)
+                changes[scope.__key__] = data
+                snapshots[scope.__key__] = snapshot
+
+        if deleted:
+            await storage.delete(deleted)
+        if changes:
+            await storage.write(changes)
+
+        self.__deleted__ = []
+        for scope in self.values():
+            if isinstance(scope, State):
+                scope.__deleted__ = []
+        self._snapshots = snapshots
+
+
+def _stored(data: Dict[str, Any], key: str) -> Dict[str, Any]:
+    item = data.get(key)
+    if item is None:
+        values = {}
+    elif isinstance(item, StoreItem):
+        values = vars(item)
+    else:
+        values = item
+    return {**values, "__key__": key}
+
+
+def _snapshot(scope: State) -> str:
+    return json.dumps(todict(scope), sort_keys=True, default=str)
\ No newline at end of file
@@ -4,7 +4,7 @@ import json
 import traceback
 from dataclasses import asdict
 
-from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.core import TurnContext
 from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.ai import AIOptions
 from teams.ai.models import AzureOpenAIModelOptions, OpenAIModel, OpenAIModelOptions
@@ -14,6 +14,7 @@ from teams.state import TurnState
 from teams.feedback_loop_data import FeedbackLoopData
 
 from config import Config
+from sqlite_storage import SqliteStorage
 
 config = Config()
 
@@ -45,7 +46,7 @@ planner = ActionPlanner(
 )
 
 # Define storage and application
-storage = MemoryStorage()
+storage = SqliteStorage(config.STATE_DB_PATH)
 bot_app = Application[TurnState](
     ApplicationOptions(
         bot_app_id=config.APP_ID,
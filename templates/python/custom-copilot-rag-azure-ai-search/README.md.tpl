@@ -51,10 +51,11 @@ This app template also demonstrates usage of techniques like:
 {{/useOpenAI}}
 1. You will see the following information indicated the success of setup:
     ```
-    Create index succeeded. If it does not exist, wait for 5 seconds...
-    Upload new documents succeeded. If they do not exist, wait for several seconds...
+    Create index succeeded. Waiting for the index to be ready...
+    Uploaded 7 new or changed chunks and deleted 0 removed chunks. If they do not exist, wait for several seconds...
     setup finished
     ```
+1. After editing, adding or removing documents in `src/indexers/data`, run the same command again. Only the chunks that changed since the last run are embedded and uploaded, and the chunks of removed documents are deleted from the index. What was indexed is recorded in `src/indexers/.index_manifest.json`. When that file does not exist, for example on the first run after upgrading a project that indexed whole documents, the chunks already in the index that are not produced again are deleted.
 1. Once you're done using the sample it's good practice to delete the index. You can do so with the command `python src/indexers/delete.py --ai-search-key <your-azure-ai-search-key>`.
 
 ### Conversation with bot
@@ -95,9 +96,11 @@ The following files are scripts and raw texts that help you to prepare or clean
 
 | File                                 | Contents                                           |
 | - | - |
-|`src/indexers/get_data.py`| Fetches data and creates embedding vectors.|
+|`src/indexers/get_data.py`| Reads the documents in `src/indexers/data`, splits them into chunks and creates their embedding vectors in batches.|
 |`src/indexers/data/*.md`| Raw text data source.|
 |`src/indexers/setup.py`| A script to create index and upload documents.|
+|`src/indexers/uploader.py`| Uploads documents to the index in bounded batches, retrying the failed ones.|
+|`src/indexers/manifest.py`| Records the content hashes of the indexed documents and chunks, so that only changes are uploaded.|
 |`src/indexers/delete.py`| A script to delete index and documents.|
 
 The following are Teams Toolkit specific project files. You can [visit a complete guide on Github](https://github.com/OfficeDev/TeamsFx/wiki/Teams-Toolkit-Visual-Studio-Code-v5-Guide#overview) to understand how Teams Toolkit works.
@@ -8,7 +8,7 @@ from http import HTTPStatus
 from aiohttp import web
 from botbuilder.core.integration import aiohttp_error_middleware
 
-from bot import bot_app
+from bot import bot_app, data_source
 
 routes = web.RouteTableDef()
 
@@ -21,8 +21,17 @@ async def on_messages(req: web.Request) -> web.Response:
 
     return web.Response(status=HTTPStatus.OK)
 
+async def on_startup(_app: web.Application):
+    # checks the index schema once instead of on the first question
+    await data_source.load_index_fields()
+
+async def on_cleanup(_app: web.Application):
+    await data_source.close()
+
 app = web.Application(middlewares=[aiohttp_error_middleware])
 app.add_routes(routes)
+app.on_startup.append(on_startup)
+app.on_cleanup.append(on_cleanup)
 
 from config import Config
 
@@ -12,29 +12,31 @@ from teams.state.memory import Memory
 from teams.state.state import TurnContext
 from teams.ai.tokenizers import Tokenizer
 from teams.ai.data_sources import DataSource
+from teams.ai.embeddings import EmbeddingsModel
 
 from config import Config
+from embedding_cache import EmbeddingCache
+from semantic_cache import SemanticCache
 
-async def get_embedding_vector(text: str):
+def tokenizer_id(tokenizer: Tokenizer) -> str:
+    # same as in indexers/get_data.py, token counts are only reused from the same tokenizer
+    encoding = getattr(tokenizer, '_encoding', None)
+    return f"{type(tokenizer).__name__}:{encoding.name}" if encoding is not None else type(tokenizer).__name__
+
+def create_embeddings_client() -> EmbeddingsModel:
     {{#useAzureOpenAI}}
-    embeddings = AzureOpenAIEmbeddings(AzureOpenAIEmbeddingsOptions(
+    return AzureOpenAIEmbeddings(AzureOpenAIEmbeddingsOptions(
         azure_api_key=Config.AZURE_OPENAI_API_KEY,
         azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
         azure_deployment=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
     ))
     {{/useAzureOpenAI}}
     {{#useOpenAI}}
-    embeddings=OpenAIEmbeddings(OpenAIEmbeddingsOptions(
+    return OpenAIEmbeddings(OpenAIEmbeddingsOptions(
         api_key=Config.OPENAI_API_KEY,
         model=Config.OPENAI_EMBEDDING_DEPLOYMENT,
     ))
     {{/useOpenAI}}
-    
-    result = await embeddings.create_embeddings(text)
-    if (result.status != 'success' or not result.output):
-        raise Exception(f"Failed to generate embeddings for description: {text}")
-    
-    return result.output[0]
 
 @dataclass
 class Doc:
@@ -42,6 +44,9 @@ class Doc:
     docTitle: Optional[str] = None
     description: Optional[str] = None
     descriptionVector: Optional[List[float]] = None
+    # tokens of the JSON encoded description, counted by the indexer with `descriptionTokenizer`
+    descriptionTokens: Optional[int] = None
+    descriptionTokenizer: Optional[str] = None
 
 @dataclass
 class AzureAISearchDataSourceOptions:
@@ -49,11 +54,30 @@ class AzureAISearchDataSourceOptions:
     indexName: str
     azureAISearchApiKey: str
     azureAISearchEndpoint: str
+    # created once when not given, and shared by every turn
+    embeddings: Optional[EmbeddingsModel] = None
+    # query embeddings cached by normalized text, set to 0 to disable the cache
+    embeddingCacheSize: int = 1024
+    embeddingCacheTtl: float = 3600
+    # most results fetched per turn, None keeps the service default
+    top: Optional[int] = None
+    # reuse the context of a previous query whose embedding is at least this similar (cosine),
+    # None disables the semantic cache
+    semanticCacheThreshold: Optional[float] = None
+    semanticCacheSize: int = 128
+    semanticCacheTtl: float = 600
+    # touched by the indexer after populating the index, which clears the semantic cache
+    indexVersionFile: Optional[str] = None
 
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from azure.core.exceptions import HttpResponseError
+from azure.search.documents.aio import SearchClient
+from azure.search.documents.indexes.aio import SearchIndexClient
 import json
 
+# token counts stored by indexers/get_data.py, missing from indexes created before they were added
+TOKEN_COUNT_FIELDS = ['descriptionTokens', 'descriptionTokenizer']
+
 @dataclass
 class Result:
     def __init__(self, output, length, too_long):
@@ -70,42 +94,106 @@ class AzureAISearchDataSource(DataSource):
             options.indexName,
             AzureKeyCredential(options.azureAISearchApiKey)
         )
+        self.embeddings = options.embeddings or create_embeddings_client()
+        self.selectedFields = None
+        self.embeddingCache = EmbeddingCache(max_entries=options.embeddingCacheSize, ttl=options.embeddingCacheTtl)
+        self.semanticCache = None
+        if options.semanticCacheThreshold is not None:
+            self.semanticCache = SemanticCache(
+                threshold=options.semanticCacheThreshold,
+                max_entries=options.semanticCacheSize,
+                ttl=options.semanticCacheTtl,
+                version_file=options.indexVersionFile,
+            )
         
     def name(self):
         return self.name
 
+    async def load_index_fields(self):
+        """
+        Looks up once which fields the index has, so the token counts are only selected when the
+        index was created with them: selecting a missing field fails the whole search.
+        """
+        if self.selectedFields is not None:
+            return self.selectedFields
+
+        # only the field injected in the prompt and its token count, vectors are large and never used here
+        selectedFields = ['description']
+        try:
+            async with SearchIndexClient(
+                self.options.azureAISearchEndpoint,
+                AzureKeyCredential(self.options.azureAISearchApiKey)
+            ) as indexClient:
+                index = await indexClient.get_index(self.options.indexName)
+            fieldNames = {field.name for field in index.fields}
+            selectedFields += [name for name in TOKEN_COUNT_FIELDS if name in fieldNames]
+        except HttpResponseError as error:
+            # a query key cannot read the schema, the token counts are then computed per turn
+            print(f"Could not read the fields of index {self.options.indexName}: {error}")
+
+        self.selectedFields = selectedFields
+        return selectedFields
+
+    async def close(self):
+        await self.searchClient.close()
+
+    async def get_embedding_vector(self, text: str):
+        embedding = self.embeddingCache.get(text)
+        if embedding is not None:
+            return embedding
+
+        result = await self.embeddings.create_embeddings(text)
+        if (result.status != 'success' or not result.output):
+            raise Exception(f"Failed to generate embeddings for description: {text}")
+
+        self.embeddingCache.set(text, result.output[0])
+        return result.output[0]
+
     async def render_data(self, _context: TurnContext, memory: Memory, tokenizer: Tokenizer, maxTokens: int):
         query = memory.get('temp.input')
-        embedding = await get_embedding_vector(query)
-        vector_query = VectorizedQuery(vector=embedding, k_nearest_neighbors=2, fields="descriptionVector")
-
-        if not query:
+        if not query or not query.strip():
             return Result('', 0, False)
 
-        selectedFields = [
-            'docTitle',
-            'description',
-            'descriptionVector',
-        ]
+        if self.semanticCache is not None:
+            cached = self.semanticCache.get_exact(query, maxTokens)
+            if cached is not None:
+                return cached
+
+        embedding = await self.get_embedding_vector(query)
+        if self.semanticCache is not None:
+            cached = self.semanticCache.get_similar(embedding, maxTokens)
+            if cached is not None:
+                return cached
 
-        searchResults = self.searchClient.search(
+        vector_query = VectorizedQuery(vector=embedding, k_nearest_neighbors=2, fields="descriptionVector")
+
+        selectedFields = await self.load_index_fields()
+
+        searchResults = await self.searchClient.search(
             search_text=query,
             select=selectedFields,
             vector_queries=[vector_query],
+            top=self.options.top,
         )
 
-        if not searchResults:
-            return Result('', 0, False)
-
         usedTokens = 0
         doc = ''
-        for result in searchResults:
-            tokens = len(tokenizer.encode(json.dumps(result["description"])))
+        tooLong = False
+        currentTokenizer = tokenizer_id(tokenizer)
+        async for result in searchResults:
+            description = json.dumps(result["description"])
+            tokens = result.get("descriptionTokens")
+            if tokens is None or result.get("descriptionTokenizer") != currentTokenizer:
+                tokens = len(tokenizer.encode(description))
 
             if usedTokens + tokens > maxTokens:
+                tooLong = True
                 break
 
-            doc += json.dumps(result["description"])
+            doc += description
             usedTokens += tokens
 
-        return Result(doc, usedTokens, usedTokens > maxTokens)
\ No newline at end of file
+        result = Result(doc, usedTokens, tooLong)
+        if self.semanticCache is not None:
+            self.semanticCache.set(query, embedding, maxTokens, result)
+        return result
\ No newline at end of file
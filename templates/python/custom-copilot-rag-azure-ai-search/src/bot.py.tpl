@@ -7,7 +7,7 @@ import traceback
 from typing import Generic, TypeVar
 
 
-from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.core import TurnContext
 from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.ai import AIOptions
 from teams.ai.models import AzureOpenAIModelOptions, OpenAIModel, OpenAIModelOptions
@@ -19,6 +19,7 @@ from teams.feedback_loop_data import FeedbackLoopData
 
 from azure_ai_search_data_source import AzureAISearchDataSource, AzureAISearchDataSourceOptions
 from config import Config
+from sqlite_storage import SqliteStorage
 
 config = Config()
 
@@ -45,23 +46,28 @@ model = OpenAIModel(
     
 prompts = PromptManager(PromptManagerOptions(prompts_folder=f"{os.getcwd()}/prompts"))
 
-prompts.add_data_source(
-    AzureAISearchDataSource(
-        AzureAISearchDataSourceOptions(
-            name='azure-ai-search',
-            indexName='contoso-electronics',
-            azureAISearchApiKey=config.AZURE_SEARCH_KEY,
-            azureAISearchEndpoint=config.AZURE_SEARCH_ENDPOINT,
-        )
+data_source = AzureAISearchDataSource(
+    AzureAISearchDataSourceOptions(
+        name='azure-ai-search',
+        indexName='contoso-electronics',
+        azureAISearchApiKey=config.AZURE_SEARCH_KEY,
+        azureAISearchEndpoint=config.AZURE_SEARCH_ENDPOINT,
+        # The semantic cache is off by default: set a cosine similarity such as 0.95 to have
+        # questions asked again in other words reuse the context found for the first one.
+        # Similar questions may need different documents, so check the answers before enabling it.
+        # The cache is cleared when the indexer touches indexVersionFile after updating the index.
+        semanticCacheThreshold=None,
+        indexVersionFile=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'indexers', '.index_version'),
     )
 )
+prompts.add_data_source(data_source)
 
 planner = ActionPlanner(
     ActionPlannerOptions(model=model, prompts=prompts, default_prompt="chat")
 )
 
 # Define storage and application
-storage = MemoryStorage()
+storage = SqliteStorage(config.STATE_DB_PATH)
 bot_app = Application[TurnState](
     ApplicationOptions(
         bot_app_id=config.APP_ID,
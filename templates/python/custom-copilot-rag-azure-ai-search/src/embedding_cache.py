@@ -0,0 +1,78 @@
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+def normalize_query(text: str) -> str:
+    """Queries differing only by case or whitespace share their embedding."""
+    return " ".join(text.lower().split())
+
+class EmbeddingCache:
+    """
+    An in-memory LRU + TTL cache of query embeddings, keyed by the normalized query text.
+
+    Vectors are stored as float32 arrays, and entries are bounded both by count and by
+    their total size. `stats` reports the hit rate of the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, array]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = normalize_query(text)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() >= entry[0]:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1].tolist()
+
+    def set(self, text: str, vector: List[float]):
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(text)
+        if key in self._entries:
+            self._remove(key)
+        value = array("f", vector)
+        size = self._size(key, value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= self._size(key, value)
+
+    def _size(self, key: str, value: array) -> int:
+        return len(key) + value.itemsize * len(value)
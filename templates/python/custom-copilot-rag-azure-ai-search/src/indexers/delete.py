@@ -4,6 +4,9 @@ from azure.search.documents.indexes import SearchIndexClient
 
 from dotenv import load_dotenv
 
+from index_version import mark_index_updated
+from manifest import remove_manifest
+
 load_dotenv(f'{os.getcwd()}/env/.env.local.user', override=True)
 
 def load_keys_from_args():
@@ -14,6 +17,8 @@ def load_keys_from_args():
 
 def delete_index(client: SearchIndexClient, name: str):
     client.delete_index(name)
+    remove_manifest()
+    mark_index_updated()
     print(f"Index {name} deleted")
 
 index = 'contoso-electronics'
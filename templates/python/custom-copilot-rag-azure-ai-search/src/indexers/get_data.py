@@ -1,41 +1,191 @@
+import asyncio
+import base64
+import json
 import os
+import random
+import time
+from typing import AsyncIterator, Iterable, Iterator, List
 
-async def get_doc_data(embeddings):
-    with open(f'{os.getcwd()}/src/indexers/data/Contoso_Electronics_PerkPlus_Program.md', 'r') as file:
-        raw_description1 = file.read()
-    doc1 = {
-        "docId": "1",
-        "docTitle": "Contoso_Electronics_PerkPlus_Program",
-        "description": raw_description1,
-        "descriptionVector": await get_embedding_vector(raw_description1, embeddings=embeddings),
-    }
-    
-    with open(f'{os.getcwd()}/src/indexers/data/Contoso_Electronics_Company_Overview.md', 'r') as file:
-        raw_description2 = file.read()
-    doc2 = {
-        "docId": "2",
-        "docTitle": "Contoso_Electronics_Company_Overview",
-        "description": raw_description2,
-        "descriptionVector": await get_embedding_vector(raw_description2, embeddings=embeddings),
-    }
-    
-    with open(f'{os.getcwd()}/src/indexers/data/Contoso_Electronics_Plan_Benefits.md', 'r') as file:
-        raw_description3 = file.read()
-    doc3 = {
-        "docId": "3",
-        "docTitle": "Contoso_Electronics_Plan_Benefits",
-        "description": raw_description3,
-        "descriptionVector": await get_embedding_vector(raw_description3, embeddings=embeddings),
-    }
-
-    return [doc1, doc2, doc3]
-
-
-async def get_embedding_vector(text: str, embeddings):
-    result = await embeddings.create_embeddings(text)
-    if (result.status != 'success' or not result.output):
-        if result.status == 'error':
-            raise Exception(f"Failed to generate embeddings for description: <{text[:200]+'...'}>\n\nError: {result.output}")
-        raise Exception(f"Failed to generate embeddings for description: <{text[:200]+'...'}>")
-    
-    return result.output[0]
\ No newline at end of file
+from manifest import IndexManifest, content_hash
+
+DATA_DIR = f'{os.getcwd()}/src/indexers/data'
+FILE_EXTENSIONS = ('.md', '.txt')
+# size of the chunks documents are split into, in characters
+CHUNK_SIZE = 2000
+# texts embedded per embeddings request, and requests in flight at once
+EMBEDDING_BATCH_SIZE = 16
+EMBEDDING_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 5
+
+class IngestionStats:
+    def __init__(self):
+        self.files = 0
+        self.unchanged = 0
+        self.chunks = 0
+        self.requests = 0
+        self.retries = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def report(self) -> str:
+        elapsed = self.elapsed or 1e-9
+        return (
+            f"{self.files} documents ({self.chunks} chunks) embedded in {elapsed:.1f}s: "
+            f"{self.files / elapsed:.1f} docs/s, {self.chunks / elapsed:.1f} chunks/s, "
+            f"{self.requests} requests, {self.retries} retries, {self.unchanged} documents unchanged"
+        )
+
+def iter_files(directory: str = DATA_DIR) -> Iterator[str]:
+    """Yields the paths of the documents under `directory`, in a stable order."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(FILE_EXTENSIONS):
+                yield os.path.join(root, file)
+
+def split_into_chunks(text: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """Splits text into chunks of at most `chunk_size` characters, on paragraph boundaries when possible."""
+    chunks = []
+    current = ''
+    for paragraph in text.split('\n\n'):
+        if not paragraph.strip():
+            continue
+        if current and len(current) + 2 + len(paragraph) > chunk_size:
+            chunks.append(current)
+            current = ''
+        current = current + '\n\n' + paragraph if current else paragraph
+        while len(current) > chunk_size:
+            chunks.append(current[:chunk_size])
+            current = current[chunk_size:]
+    if current:
+        chunks.append(current)
+    return chunks
+
+def doc_id(relative_path: str, chunk: int) -> str:
+    # document keys only allow letters, digits, '_', '-' and '='
+    return base64.urlsafe_b64encode(relative_path.encode('utf-8')).decode('ascii') + f'-{chunk}'
+
+def iter_chunks(directory: str = DATA_DIR, stats: IngestionStats = None, manifest: IndexManifest = None) -> Iterator[dict]:
+    """
+    Reads the documents one at a time and yields their chunks, without vectors.
+    With a manifest, only the chunks that are new or changed since the last run are yielded.
+    """
+    relative_paths = set()
+    for path in iter_files(directory):
+        relative_path = os.path.relpath(path, directory).replace(os.sep, '/')
+        relative_paths.add(relative_path)
+        stat = os.stat(path)
+        if manifest and manifest.unchanged(relative_path, stat):
+            if stats:
+                stats.unchanged += 1
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+        if manifest and manifest.same_content(relative_path, stat, content_hash(text)):
+            if stats:
+                stats.unchanged += 1
+            continue
+        title = os.path.splitext(os.path.basename(path))[0]
+        docs = [
+            {
+                "docId": doc_id(relative_path, i),
+                "docTitle": title,
+                "description": chunk,
+            }
+            for i, chunk in enumerate(split_into_chunks(text))
+        ]
+        if manifest:
+            changed = manifest.stage(
+                relative_path,
+                stat,
+                content_hash(text),
+                {doc["docId"]: content_hash(doc["description"]) for doc in docs},
+            )
+            docs = [doc for doc in docs if doc["docId"] in changed]
+        yield from docs
+        if stats:
+            stats.files += 1
+    if manifest:
+        manifest.remove_missing(relative_paths)
+
+def batched(items: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def embed_batch(docs: List[dict], embeddings, stats: IngestionStats = None) -> List[dict]:
+    """Embeds the descriptions of `docs` in one request, retrying with exponential backoff when throttled."""
+    texts = [doc["description"] for doc in docs]
+    for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+        if stats:
+            stats.requests += 1
+        result = await embeddings.create_embeddings(texts)
+        if result.status == 'success' and result.output:
+            for doc, vector in zip(docs, result.output):
+                doc["descriptionVector"] = vector
+            return docs
+        if result.status != 'rate_limited':
+            raise Exception(f"Failed to generate embeddings for {len(docs)} chunks: {result.output or result.message}")
+        if attempt == EMBEDDING_MAX_RETRIES:
+            raise Exception(f"Failed to generate embeddings for {len(docs)} chunks after {attempt + 1} attempts: {result.output or result.message}")
+        if stats:
+            stats.retries += 1
+        await asyncio.sleep(min(30, 2 ** attempt) * (0.5 + random.random() / 2))
+
+async def embed_chunks(chunks: Iterable[dict], embeddings, stats: IngestionStats = None) -> AsyncIterator[List[dict]]:
+    """
+    Yields the chunks with their vectors, a batch at a time as the embeddings requests complete.
+    At most EMBEDDING_CONCURRENCY requests are in flight, so chunks are only read as fast as they are embedded.
+    """
+    pending = set()
+    try:
+        for batch in batched(chunks, EMBEDDING_BATCH_SIZE):
+            if len(pending) >= EMBEDDING_CONCURRENCY:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield _completed(task, stats)
+            pending.add(asyncio.ensure_future(embed_batch(batch, embeddings, stats)))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield _completed(task, stats)
+    finally:
+        for task in pending:
+            task.cancel()
+
+def _completed(task, stats: IngestionStats) -> List[dict]:
+    docs = task.result()
+    if stats:
+        stats.chunks += len(docs)
+    return docs
+
+async def get_doc_data(
+    embeddings,
+    directory: str = DATA_DIR,
+    stats: IngestionStats = None,
+    manifest: IndexManifest = None,
+) -> AsyncIterator[List[dict]]:
+    """Yields the documents of `directory` to index, chunked and embedded, in batches."""
+    stats = stats or IngestionStats()
+    async for docs in embed_chunks(iter_chunks(directory, stats, manifest), embeddings, stats):
+        yield docs
+    print(stats.report())
+
+def tokenizer_id(tokenizer) -> str:
+    # same as in azure_ai_search_data_source.py, token counts are only reused from the same tokenizer
+    encoding = getattr(tokenizer, '_encoding', None)
+    return f"{type(tokenizer).__name__}:{encoding.name}" if encoding is not None else type(tokenizer).__name__
+
+def add_token_counts(docs, tokenizer):
+    # counts the JSON encoded description, which is what the data source injects in the prompt
+    for doc in docs:
+        doc["descriptionTokens"] = len(tokenizer.encode(json.dumps(doc["description"])))
+        doc["descriptionTokenizer"] = tokenizer_id(tokenizer)
@@ -0,0 +1,10 @@
+import os
+
+# watched by the semantic cache of the data source, see `indexVersionFile` in bot.py
+INDEX_VERSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.index_version')
+
+def mark_index_updated():
+    """Touches the index version file so the bots running from this folder drop their cached search results."""
+    with open(INDEX_VERSION_FILE, 'a'):
+        pass
+    os.utime(INDEX_VERSION_FILE)
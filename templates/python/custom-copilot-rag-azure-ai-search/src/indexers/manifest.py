@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+MANIFEST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.index_manifest.json')
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class IndexManifest:
+    """
+    Remembers what was last indexed from the data folder, so that only new or changed chunks are
+    embedded and uploaded, and the chunks that no longer exist are deleted from the index.
+
+    Each document is recorded with its size, modification time and content hash, and each of its
+    chunks with its key and content hash. A document whose size and modification time did not change
+    is not read again. A chunk is recorded once it is uploaded, and a document once all of its chunks
+    are, so an interrupted run resumes where it stopped. Keys to delete are kept until deleted.
+
+    When `settings` (index, chunk size, embeddings model...) differ from the recorded ones, every chunk
+    is embedded again and the keys that are not produced anymore are deleted.
+    """
+
+    def __init__(self, settings: dict, path: str = MANIFEST_FILE):
+        self.path = path
+        self.settings = settings
+        data = self._load()
+        # nothing is known about what the index holds when no manifest was saved yet
+        self.new = not data
+        self._documents: Dict[str, dict] = data.get('documents', {})
+        self._deletes: Set[str] = set(data.get('deletes', []))
+        if data.get('settings') != settings:
+            for document in self._documents.values():
+                document.update(mtime_ns=None, size=None, sha256=None)
+                document['chunks'] = dict.fromkeys(document['chunks'])
+        # chunks staged for upload, by key: (document, chunk hash)
+        self._pending: Dict[str, tuple] = {}
+        # documents with staged chunks: (stat, hash, keys still to upload)
+        self._staged: Dict[str, tuple] = {}
+
+    def unchanged(self, relative_path: str, stat: os.stat_result) -> bool:
+        document = self._documents.get(relative_path)
+        return document is not None and document['mtime_ns'] == stat.st_mtime_ns and document['size'] == stat.st_size
+
+    def stage(self, relative_path: str, stat: os.stat_result, sha256: str, chunks: Dict[str, str]) -> Set[str]:
+        """
+        Records the chunks (key: content hash) a document is now split into, and returns the keys to upload.
+        Keys of the previous version of the document that are gone are scheduled for deletion.
+        """
+        previous = self._documents.get(relative_path, {}).get('chunks', {})
+        self._deletes.update(key for key in previous if key not in chunks)
+        changed = {key for key, chunk_hash in chunks.items() if previous.get(key) != chunk_hash}
+        self._deletes.difference_update(chunks)
+        self._documents[relative_path] = {
+            'mtime_ns': None,
+            'size': None,
+            'sha256': None,
+            'chunks': {key: chunk_hash for key, chunk_hash in chunks.items() if key not in changed},
+        }
+        for key in changed:
+            self._pending[key] = (relative_path, chunks[key])
+        self._staged[relative_path] = (stat, sha256, set(changed))
+        if not changed:
+            self._complete(relative_path)
+        return changed
+
+    def same_content(self, relative_path: str, stat: os.stat_result, sha256: str) -> bool:
+        """Whether a document that was touched still has the content last indexed, recording its new stat if so."""
+        document = self._documents.get(relative_path)
+        if document is None or document['sha256'] != sha256:
+            return False
+        document.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        return True
+
+    def indexed(self, keys: Iterable[str]):
+        """Records the chunks that were uploaded."""
+        for key in keys:
+            pending = self._pending.pop(key, None)
+            if pending is None:
+                continue
+            relative_path, chunk_hash = pending
+            self._documents[relative_path]['chunks'][key] = chunk_hash
+            remaining = self._staged[relative_path][2]
+            remaining.discard(key)
+            if not remaining:
+                self._complete(relative_path)
+
+    def remove_missing(self, relative_paths: Set[str]):
+        """Schedules the chunks of the documents not in `relative_paths` for deletion."""
+        for relative_path in list(self._documents):
+            if relative_path not in relative_paths:
+                self._deletes.update(self._documents.pop(relative_path)['chunks'])
+
+    def delete_unknown(self, keys: Iterable[str]):
+        """Schedules the indexed `keys` for deletion, except the ones the current documents produce again."""
+        self._deletes.update(keys)
+
+    def pending_deletes(self) -> List[str]:
+        return sorted(self._deletes)
+
+    def deleted(self, keys: Iterable[str]):
+        self._deletes.difference_update(keys)
+
+    def save(self):
+        data = {
+            'settings': self.settings,
+            'documents': self._documents,
+            'deletes': sorted(self._deletes),
+        }
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+
+    def _complete(self, relative_path: str):
+        stat, sha256, _ = self._staged.pop(relative_path)
+        self._documents[relative_path].update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=sha256)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+def remove_manifest(path: Optional[str] = None):
+    """Forgets what was indexed, so that the next run indexes every document again."""
+    try:
+        os.remove(path or MANIFEST_FILE)
+    except FileNotFoundError:
+        pass
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from typing import List, Optional
 
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes.models import (
     SearchIndex,
@@ -23,8 +23,12 @@ from teams.ai.embeddings import AzureOpenAIEmbeddings, AzureOpenAIEmbeddingsOpti
 {{#useOpenAI}}
 from teams.ai.embeddings import OpenAIEmbeddings, OpenAIEmbeddingsOptions
 {{/useOpenAI}}
+from teams.ai.tokenizers import GPTTokenizer
 
-from get_data import get_doc_data
+from get_data import CHUNK_SIZE, IngestionStats, get_doc_data, add_token_counts
+from index_version import mark_index_updated
+from manifest import IndexManifest
+from uploader import DocumentUploader, wait_for_index
 
 from dotenv import load_dotenv
 
@@ -36,9 +40,8 @@ class Doc:
     docTitle: Optional[str] = None
     description: Optional[str] = None
     descriptionVector: Optional[List[float]] = None
-
-async def upsert_documents(client: SearchClient, documents: list[Doc]):
-    return client.merge_or_upload_documents(documents)
+    descriptionTokens: Optional[int] = None
+    descriptionTokenizer: Optional[str] = None
 
 async def create_index_if_not_exists(client: SearchIndexClient, name: str):
     doc_index = SearchIndex(
@@ -48,6 +51,9 @@ async def create_index_if_not_exists(client: SearchIndexClient, name: str):
             SimpleField(name="docTitle", type=SearchFieldDataType.String),
             SearchableField(name="description", type=SearchFieldDataType.String, searchable=True),
             SearchField(name="descriptionVector", type=SearchFieldDataType.Collection(SearchFieldDataType.Single), hidden=False, searchable=True, vector_search_dimensions=1536, vector_search_profile_name='my-vector-config'),
+            # lets the data source pack results without tokenizing them on every turn
+            SimpleField(name="descriptionTokens", type=SearchFieldDataType.Int32),
+            SimpleField(name="descriptionTokenizer", type=SearchFieldDataType.String),
         ],
         scoring_profiles=[],
         cors_options=CorsOptions(allowed_origins=["*"]),
@@ -79,10 +85,10 @@ async def setup(search_api_key, search_api_endpoint, args):
     search_index_client = SearchIndexClient(search_api_endpoint, credentials)
     await create_index_if_not_exists(search_index_client, index)
     
-    print("Create index succeeded. If it does not exist, wait for 5 seconds...")
-    await asyncio.sleep(5)
+    print("Create index succeeded. Waiting for the index to be ready...")
 
     search_client = SearchClient(search_api_endpoint, index, credentials)
+    await wait_for_index(search_client)
 
     {{#useAzureOpenAI}}
     embeddings = AzureOpenAIEmbeddings(AzureOpenAIEmbeddingsOptions(
@@ -97,10 +103,47 @@ async def setup(search_api_key, search_api_endpoint, args):
         model='text-embedding-ada-002'
     ))
     {{/useOpenAI}}
-    data = await get_doc_data(embeddings=embeddings)
-    await upsert_documents(search_client, data)
-
-    print("Upload new documents succeeded. If they do not exist, wait for several seconds...")
+    {{#useAzureOpenAI}}
+    embeddings_model = os.getenv('AZURE_OPENAI_EMBEDDING_DEPLOYMENT')
+    {{/useAzureOpenAI}}
+    {{#useOpenAI}}
+    embeddings_model = 'text-embedding-ada-002'
+    {{/useOpenAI}}
+    # only the chunks that changed since the last run are embedded and uploaded
+    manifest = IndexManifest(settings={
+        "endpoint": search_api_endpoint,
+        "index": index,
+        "chunkSize": CHUNK_SIZE,
+        "embeddings": embeddings_model,
+    })
+    if manifest.new:
+        # the index may hold chunks of an earlier run, such as the keys "1", "2" and "3" used before
+        # documents were chunked: the ones that are not produced again are deleted after the upload
+        results = await search_client.search(search_text="*", select=["docId"])
+        manifest.delete_unknown([result["docId"] async for result in results])
+    stats = IngestionStats()
+    tokenizer = GPTTokenizer()
+    # documents are sent in bounded batches while the next ones are embedded
+    uploader = DocumentUploader(search_client, on_success=manifest.indexed)
+    deleter = DocumentUploader(search_client, action='delete', on_success=manifest.deleted)
+    try:
+        async with uploader:
+            async for data in get_doc_data(embeddings=embeddings, stats=stats, manifest=manifest):
+                add_token_counts(data, tokenizer)
+                for doc in data:
+                    await uploader.add(doc)
+        async with deleter:
+            for key in manifest.pending_deletes():
+                await deleter.add({"docId": key})
+    finally:
+        manifest.save()
+        await search_client.close()
+    if uploader.stats.succeeded or deleter.stats.succeeded:
+        mark_index_updated()
+
+    for key, status_code, error_message in uploader.stats.failed + deleter.stats.failed:
+        print(f"Failed to index {key} ({status_code}): {error_message}")
+    print(f"Uploaded {uploader.stats.succeeded} new or changed chunks and deleted {deleter.stats.succeeded} removed chunks. If they do not exist, wait for several seconds...")
     
 args = load_keys_from_args()
 search_api_key = args.ai_search_key
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import random
+import time
+from typing import Callable, List, Optional
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.search.documents.aio import SearchClient
+from azure.search.documents.models import IndexDocumentsBatch
+
+# the service accepts at most 1000 documents and 16 MB per request
+MAX_BATCH_DOCUMENTS = 1000
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+MAX_IN_FLIGHT = 4
+MAX_RETRIES = 5
+# statuses of the documents that can succeed when sent again
+RETRIABLE_STATUS_CODES = {409, 422, 429, 503}
+
+class UploadStats:
+    def __init__(self):
+        self.requests = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = []
+
+class DocumentUploader:
+    """
+    Sends documents to a search index in batches bounded by count and by size.
+
+    At most `max_in_flight` batches are sent at once, and `add` waits while they are all in flight,
+    so the documents held in memory are bounded whatever the size of the corpus. Documents the service
+    rejects with a retriable status are sent again with exponential backoff, the others are recorded
+    in `stats.failed`. The keys of the documents that succeeded are passed to `on_success`.
+    """
+
+    def __init__(
+        self,
+        client: SearchClient,
+        action: str = 'mergeOrUpload',
+        key_field: str = 'docId',
+        on_success: Optional[Callable[[List[str]], None]] = None,
+        max_batch_documents: int = MAX_BATCH_DOCUMENTS,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        max_retries: int = MAX_RETRIES,
+    ):
+        self.client = client
+        self.action = action
+        self.key_field = key_field
+        self.on_success = on_success
+        self.max_batch_documents = max_batch_documents
+        self.max_batch_bytes = max_batch_bytes
+        self.max_retries = max_retries
+        self.stats = UploadStats()
+        self._batch = []
+        self._batch_bytes = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._tasks = set()
+        self._error = None
+
+    async def __aenter__(self) -> "DocumentUploader":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            # record what is already in flight, but send nothing new
+            await self._wait()
+
+    async def add(self, document: dict):
+        self._raise_error()
+        size = len(json.dumps(document))
+        if self._batch and (
+            len(self._batch) >= self.max_batch_documents or self._batch_bytes + size > self.max_batch_bytes
+        ):
+            await self.flush()
+        self._batch.append(document)
+        self._batch_bytes += size
+
+    async def flush(self):
+        if not self._batch:
+            return
+        batch = self._batch
+        self._batch = []
+        self._batch_bytes = 0
+        await self._slots.acquire()
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+
+    async def close(self):
+        """Sends the last batch and waits for every batch in flight."""
+        await self.flush()
+        await self._wait()
+        self._raise_error()
+
+    async def _send(self, documents: List[dict]):
+        for attempt in range(self.max_retries + 1):
+            self.stats.requests += 1
+            results = await self.client.index_documents(self._new_batch(documents))
+            succeeded = [result.key for result in results if result.succeeded]
+            self.stats.succeeded += len(succeeded)
+            if succeeded and self.on_success:
+                self.on_success(succeeded)
+
+            retry_keys = set()
+            for result in results:
+                if result.succeeded:
+                    continue
+                if result.status_code in RETRIABLE_STATUS_CODES and attempt < self.max_retries:
+                    retry_keys.add(result.key)
+                else:
+                    self.stats.failed.append((result.key, result.status_code, result.error_message))
+            if not retry_keys:
+                return
+            documents = [document for document in documents if document[self.key_field] in retry_keys]
+            self.stats.retried += len(documents)
+            await asyncio.sleep(min(30, 2 ** attempt) * (0.5 + random.random() / 2))
+
+    def _new_batch(self, documents: List[dict]) -> IndexDocumentsBatch:
+        batch = IndexDocumentsBatch()
+        if self.action == 'delete':
+            batch.add_delete_actions(documents)
+        elif self.action == 'upload':
+            batch.add_upload_actions(documents)
+        elif self.action == 'merge':
+            batch.add_merge_actions(documents)
+        else:
+            batch.add_merge_or_upload_actions(documents)
+        return batch
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception() is not None and self._error is None:
+            self._error = task.exception()
+
+    async def _wait(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+async def wait_for_index(client: SearchClient, timeout: float = 60, interval: float = 0.5):
+    """Waits until the index answers requests, polling with a growing interval."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await client.get_document_count()
+            return
+        except ResourceNotFoundError:
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, 5)
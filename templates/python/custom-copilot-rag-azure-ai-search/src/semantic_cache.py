@@ -0,0 +1,128 @@
+import math
+import os
+import time
+from array import array
+from collections import OrderedDict
+from operator import mul
+from typing import Any, List, Optional
+
+from embedding_cache import normalize_query
+
+class SemanticCacheEntry:
+    def __init__(self, vector: array, max_tokens: int, value: Any, expires_at: float):
+        self.vector = vector
+        self.max_tokens = max_tokens
+        self.value = value
+        self.expires_at = expires_at
+
+class SemanticCache:
+    """
+    Caches the context rendered for a query and reuses it for later queries meaning the same.
+
+    A query matches a cached one when their normalized text is equal, which is checked before
+    any embedding is computed, or when the cosine similarity of their embeddings reaches
+    `threshold`. Entries are bounded by count (LRU) and expire after `ttl` seconds.
+
+    When `version_file` is set, the cache is cleared whenever the modification time of that file
+    changes, checked at most every `version_check_interval` seconds. The indexer touches it
+    after populating the index.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 128,
+        ttl: float = 600,
+        version_file: Optional[str] = None,
+        version_check_interval: float = 5,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_file = version_file
+        self.version_check_interval = version_check_interval
+        self._entries: "OrderedDict[str, SemanticCacheEntry]" = OrderedDict()
+        self._version = self._read_version()
+        self._version_checked_at = time.monotonic()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get_exact(self, query: str, max_tokens: int) -> Optional[Any]:
+        self._check_version()
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is None or not self._usable(key, entry, max_tokens):
+            return None
+        self._entries.move_to_end(key)
+        self.exact_hits += 1
+        return entry.value
+
+    def get_similar(self, vector: List[float], max_tokens: int) -> Optional[Any]:
+        """Returns the value of the most similar cached query within the threshold, counting a miss otherwise."""
+        query_vector = _normalize(vector)
+        best_key, best_similarity = None, self.threshold
+        for key, entry in list(self._entries.items()):
+            if not self._usable(key, entry, max_tokens):
+                continue
+            similarity = sum(map(mul, query_vector, entry.vector))
+            if similarity >= best_similarity:
+                best_key, best_similarity = key, similarity
+        if best_key is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_key)
+        self.semantic_hits += 1
+        return self._entries[best_key].value
+
+    def set(self, query: str, vector: List[float], max_tokens: int, value: Any):
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(query)
+        self._entries.pop(key, None)
+        self._entries[key] = SemanticCacheEntry(_normalize(vector), max_tokens, value, time.monotonic() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def stats(self) -> dict:
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def _usable(self, key: str, entry: SemanticCacheEntry, max_tokens: int) -> bool:
+        if time.monotonic() >= entry.expires_at:
+            del self._entries[key]
+            return False
+        # the context was packed for that token budget
+        return entry.max_tokens == max_tokens
+
+    def _check_version(self):
+        if not self.version_file or time.monotonic() - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = time.monotonic()
+        version = self._read_version()
+        if version != self._version:
+            self._version = version
+            self.clear()
+
+    def _read_version(self) -> Optional[int]:
+        if not self.version_file:
+            return None
+        try:
+            return os.stat(self.version_file).st_mtime_ns
+        except OSError:
+            return None
+
+def _normalize(vector: List[float]) -> array:
+    norm = math.sqrt(sum(map(mul, vector, vector))) or 1.0
+    return array("f", (value / norm for value in vector))
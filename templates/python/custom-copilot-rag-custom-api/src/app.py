@@ -7,7 +7,7 @@ from http import HTTPStatus
 from aiohttp import web
 from botbuilder.core.integration import aiohttp_error_middleware
 
-from bot import bot_app
+from bot import assets, bot_app, client
 
 routes = web.RouteTableDef()
 
@@ -20,8 +20,19 @@ async def on_messages(req: web.Request) -> web.Response:
 
     return web.Response(status=HTTPStatus.OK)
 
+async def on_startup(_app: web.Application):
+    # card templates and actions edited while the app runs are reloaded in the background
+    assets.start_watching()
+
+async def on_cleanup(_app: web.Application):
+    await assets.stop_watching()
+    # closes the connections kept open to the API
+    await client.close()
+
 app = web.Application(middlewares=[aiohttp_error_middleware])
 app.add_routes(routes)
+app.on_startup.append(on_startup)
+app.on_cleanup.append(on_cleanup)
 
 from config import Config
 
@@ -3,22 +3,23 @@ import sys
 import traceback
 
 from typing import Any, Dict, List
-from botbuilder.core import MemoryStorage, TurnContext, CardFactory, MessageFactory
+from botbuilder.core import TurnContext, CardFactory, MessageFactory, Middleware
 from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.ai import AIOptions
-from teams.ai.actions import ActionTurnContext
+from teams.ai.actions import ActionTurnContext, ActionTypes
 from teams.ai.models import AzureOpenAIModelOptions, OpenAIModel, OpenAIModelOptions
-from teams.ai.planners import ActionPlanner, ActionPlannerOptions
+from teams.ai.planners import ActionPlanner, ActionPlannerOptions, Plan, PredictedDoCommand
 from teams.ai.prompts import PromptManager, PromptManagerOptions
-from teams.state import TurnState
 from teams.ai.prompts import PromptFunctions, PromptManager, PromptManagerOptions
 from teams.ai.tokenizers import Tokenizer
 from teams.state import MemoryBase
 
 from config import Config
+from sqlite_storage import SqliteStorage
 from state import AppTurnState
 from lib.requests_openapi import OpenAPIClient
-from lib.adaptive_card_renderer import AdaptiveCardRenderer
+from lib.api_batch import ApiBatch, get_turn_batch, pop_turn_batch
+from lib.asset_registry import AssetRegistry
 import json
 
 config = Config()
@@ -52,8 +53,8 @@ planner = ActionPlanner(
 )
 
 # Define storage and application
-storage = MemoryStorage()
-bot_app = Application[TurnState](
+storage = SqliteStorage(config.STATE_DB_PATH)
+bot_app = Application[AppTurnState](
     ApplicationOptions(
         bot_app_id=config.APP_ID,
         storage=storage,
@@ -62,6 +63,10 @@ bot_app = Application[TurnState](
     )
 )
 
+@bot_app.turn_state_factory
+async def turn_state_factory(context: TurnContext):
+    return await AppTurnState.load(context, storage)
+
 @bot_app.error
 async def on_error(context: TurnContext, error: Exception):
     # This check writes out errors to console log .vs. app insights.
@@ -76,7 +81,127 @@ async def on_error(context: TurnContext, error: Exception):
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 spec_path = os.path.join(current_dir, '../appPackage/apiSpecificationFile/{{OPENAPI_SPEC_PATH}}')
-client = OpenAPIClient().load_spec_from_file(spec_path)
+client = OpenAPIClient(lazy=True).load_spec_from_file(spec_path)
+# Card templates and action manifests are loaded once and reloaded when their files change
+assets = AssetRegistry(os.path.join(current_dir, 'adaptiveCards'), prompts_folder_path)
+
+# Limits on how much of an API response is read: responses are parsed while they are
+# received and the items of a top-level array beyond the first ones are dropped, as Teams messages are size limited.
+API_RESPONSE_MAX_ITEMS = 20
+API_RESPONSE_MAX_BYTES = 1024 * 1024
+# The API calls of a plan are sent concurrently once it is ready, before its actions run,
+# and must each answer within this many seconds.
+API_BATCH_TIMEOUT = 30
+# Teams rejects messages over about 28 KB: the cards and texts sent in a turn share this budget,
+# and results that do not fit are summarized as "N more results".
+ADAPTIVE_CARDS_MAX_BYTES = 24 * 1024
+
+def get_api_batch(context: TurnContext) -> ApiBatch:
+    return get_turn_batch(
+        context,
+        client,
+        timeout=API_BATCH_TIMEOUT,
+        max_items=API_RESPONSE_MAX_ITEMS,
+        max_bytes=API_RESPONSE_MAX_BYTES,
+    )
+
+TRUNCATED_NOTE = "(results truncated)"
+TRUNCATED_CARD_ELEMENT = {"type": "TextBlock", "text": TRUNCATED_NOTE, "isSubtle": True, "wrap": True}
+
+def truncate_text(text: str, max_bytes: int, truncated: bool = False) -> str:
+    # Cuts the text to at most max_bytes of UTF-8, noting when it or the response it comes from was truncated
+    note = "\n\n" + TRUNCATED_NOTE
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text + note if truncated else text
+    cut = encoded[: max(0, max_bytes - len(note.encode("utf-8")))]
+    return cut.decode("utf-8", errors="ignore") + note
+
+def render_api_response(operation_id: str, resp, max_bytes: int):
+    # Returns an adaptive card attachment when the operation has a card template, else the response text
+    renderer = assets.get_renderer(operation_id)
+    if renderer is None:
+        return truncate_text(resp.text, max_bytes, resp.truncated)
+
+    # keep room for the note telling the user that only part of the results were received
+    note_bytes = len(json.dumps(TRUNCATED_CARD_ELEMENT)) + 1 if resp.truncated else 0
+    rendered_card_str = renderer.render(resp.data if resp.is_json else resp.text, max_bytes=max_bytes - note_bytes)
+    rendered_card_json = json.loads(rendered_card_str)
+    if resp.truncated:
+        rendered_card_json.setdefault("body", []).append(TRUNCATED_CARD_ELEMENT)
+    return CardFactory.adaptive_card(rendered_card_json)
+
+def api_call_kwargs(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    # Maps the parameters the model predicted for an API action to the operation arguments
+    parameters = parameters or {}
+    return dict(
+        **parameters.get("path", {}),
+        json=parameters.get("body", None),
+        _headers={},
+        _params=parameters.get("query", {}),
+        _cookies={},
+    )
+
+@bot_app.ai.action(ActionTypes.PLAN_READY, allow_overrides=True)
+async def start_api_calls(context: ActionTurnContext[Plan], state: AppTurnState):
+    # Sends the API calls of the plan concurrently, the actions then wait for their own result
+    batch = get_api_batch(context)
+    for command in context.data.commands:
+        if isinstance(command, PredictedDoCommand) and client.has_operation(command.action):
+            batch.add(command.action, **api_call_kwargs(command.parameters))
+    batch.start()
+    return "" if len(context.data.commands) > 0 else ActionTypes.STOP
+
+async def run_api_action(context: ActionTurnContext[Dict[str, Any]], operation_id: str) -> str:
+    # Waits for the call of an API action and returns its outcome to the model
+    result = await get_api_batch(context).result(operation_id, **api_call_kwargs(context.data))
+    if result.error is not None:
+        return f"Failed to call {operation_id}: {result.error}"
+    if result.response.status_code != 200:
+        return f"{operation_id} failed with status {result.response.status_code} {result.response.reason}"
+    # the result itself is sent to the user once the turn ends
+    if result.response.truncated:
+        return f"{operation_id} succeeded, its results were truncated and only the first ones are shown to the user"
+    return f"{operation_id} succeeded, its result is shown to the user"
+
+async def send_api_results(context: TurnContext, batch: ApiBatch):
+    results = [
+        result for result in batch.results if result.error is None and result.response.status_code == 200
+    ]
+    card_max_bytes = ADAPTIVE_CARDS_MAX_BYTES // max(1, len(results))
+    attachments, texts = [], []
+    for result in results:
+        rendered = render_api_response(result.call.operation_id, result.response, card_max_bytes)
+        if isinstance(rendered, str):
+            texts.append(rendered)
+        else:
+            attachments.append(rendered)
+
+    # Send every result of the turn as a single activity
+    text = "\n\n".join(texts) or None
+    if attachments:
+        await context.send_activity(MessageFactory.list(attachments, text))
+    elif text:
+        await context.send_activity(text)
+
+class ApiBatchMiddleware(Middleware):
+    """
+    Ends the API batch of every turn, including the turns that stop before after_turn handlers run
+    (an unknown action, flagged content, an empty plan or an error): calls planned but never run by
+    an action are cancelled, and the results of the turn are sent unless it failed.
+    """
+
+    async def on_turn(self, context: TurnContext, logic):
+        try:
+            await logic()
+        finally:
+            batch = pop_turn_batch(context)
+            if batch is not None:
+                await batch.cancel()
+        if batch is not None:
+            await send_api_results(context, batch)
+
+bot_app.adapter.use(ApiBatchMiddleware())
 
 @prompts.function("getAction")
 async def get_actions(
@@ -86,11 +211,6 @@ async def get_actions(
     _tokenizer: Tokenizer,
     _args: List[str],
 ):
-    action_path = os.path.join(current_dir, 'prompts/chat/actions.json')
-    # Read the file content
-    with open(action_path, 'r') as action_file:
-        action_file_content = action_file.read()
-
-    return action_file_content
+    return assets.get_actions("chat")
 
 # Replace with action code
\ No newline at end of file
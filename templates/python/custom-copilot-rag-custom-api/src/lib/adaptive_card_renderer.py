@@ -1,96 +1,213 @@
 from enum import Enum
 import json
 import re
-import copy
 import traceback
 
+# ${...} expressions, whitespace inside them is removed before parsing
+EXPRESSION_PATTERN = re.compile(r'\$\{[^}]*\}')
+QUOTED_OR_WHITESPACE_PATTERN = re.compile(r'(["\'].*?["\'])|(\s+)')
+# Only support expression like ${if(data,data,'value')} in TextBlock element
+IF_EXPRESSION_PATTERN = r"\$\{if\(([^,]+),([^,]+),([^)]+)\)\}"
+# Only support expression like ${jsonStringify(data)} in TextBlock element
+JSON_STRINGIFY_EXPRESSION_PATTERN = r"\$\{jsonStringify\(([^\)]+)\)\}"
+TEMPLATE_KEY_PATTERN = r"\${(.*?)}"
+TEXT_EXPRESSION_PATTERN = re.compile(
+    f"{IF_EXPRESSION_PATTERN}|{JSON_STRINGIFY_EXPRESSION_PATTERN}|{TEMPLATE_KEY_PATTERN}"
+)
+# Only support expression like ${image!=null&&image!=''} in Image element
+BOOLEAN_EXPRESSION_PATTERN = re.compile(r"\$\{(\w+)!=null&&\w+!=''\}")
+ARRAY_INDEX_PATTERN = re.compile(r'\[\d+\]$')
+COMPACT_SEPARATORS = (",", ":")
+
 class ElementType(Enum):
     TEXTBLOCK = "TextBlock"
     CONTAINER = "Container"
     IMAGE = "Image"
 
+def _serialized_size(value):
+    # ASCII-escaped compact JSON, so its length is its size in bytes
+    return len(json.dumps(value, separators=COMPACT_SEPARATORS))
+
+def _more_results_element(count):
+    return {"type": "TextBlock", "text": f"{count} more results", "isSubtle": True, "wrap": True}
+
+class _RenderBudget:
+    """Bytes left for the card body, charged as rendered elements are added to it."""
+
+    def __init__(self, remaining):
+        self.remaining = remaining
+        self.exhausted = False
+        self.omitted = 0
+
+    def fits(self, element):
+        if self.exhausted:
+            return False
+        # one more byte for the separating comma
+        size = _serialized_size(element) + 1
+        if size > self.remaining:
+            self.exhausted = True
+            return False
+        self.remaining -= size
+        return True
+
+    def charge(self, elements):
+        # elements kept whatever their size, the items that follow may not fit anymore
+        self.remaining -= sum(_serialized_size(element) + 1 for element in elements)
+
+    def omit(self, count):
+        self.omitted += count
+
 class AdaptiveCardRenderer:
+    """
+    Renders an adaptive card template against API response data.
+
+    The template is compiled once into a render plan: every `${...}` expression is parsed
+    into an evaluator, so rendering only walks the plan against the data.
+    Output elements are built fresh from the compiled template and share its unchanged
+    parts, which is safe since the rendered card is only serialized.
+
+    With `max_bytes`, the serialized size of the card is tracked while `$data` items are
+    expanded: rendering stops before the card exceeds the budget and a "N more results"
+    element is appended instead of the items left out. Static elements are always kept,
+    the budget left after them is spent on the items.
+    """
+
     def __init__(self, template_str: str):
         self.template_str = template_str
+        self._template = None
+        self._body_plan = None
 
-    def render(self, data_str: str):
+    def render(self, data_str, max_bytes=None):
+        # accepts either the JSON string of the API response or its already parsed value
         try:
-            data = json.loads(data_str)
-            self.root = data
-
-            simplified_template = self.__remove_space_in_expression(self.template_str)
-            template = json.loads(simplified_template)
+            data = json.loads(data_str) if isinstance(data_str, (str, bytes)) else data_str
+            self.compile()
 
-            card_body = template["body"]
-            result = self.__render_adaptive_card_body(card_body, data)
-            template["body"] = result
+            template = dict(self._template)
+            template["body"] = []
+            budget = None
+            if max_bytes is not None:
+                # room is kept for the "N more results" element, whatever the number of results
+                reserved = _serialized_size(template) + _serialized_size(_more_results_element(10**9)) + 1
+                budget = _RenderBudget(max_bytes - reserved)
+            template["body"] = self.__render_adaptive_card_body(self._body_plan, data, data, budget)
+            if budget is not None and budget.omitted:
+                template["body"].append(_more_results_element(budget.omitted))
 
-            return json.dumps(template, indent=2)
+            return json.dumps(template, separators=COMPACT_SEPARATORS)
         except Exception as e:
             print(f"An error occurred while rendering adaptive card: {traceback.format_exc()}")
             return self.template_str
-        
-    def __render_adaptive_card_body(self, template, data):
-        result = []
 
-        if isinstance(data, list): 
-            for item in data:
-                result.append(self.__render_adaptive_card_body(template, item))
+    def compile(self):
+        """Compiles the template, which is otherwise done on the first render. Raises when it is invalid."""
+        if self._body_plan is not None:
+            return
+        simplified_template = self.__remove_space_in_expression(self.template_str)
+        template = json.loads(simplified_template)
+        body_plan = self.__compile_adaptive_card_body(template["body"])
+        self._template = template
+        self._body_plan = body_plan
+
+    def __render_adaptive_card_body(self, plan, data, root, budget=None):
+        # only the outermost repeated elements are charged to the budget, their content is not
+        if isinstance(data, list):
+            result = []
+            for index, item in enumerate(data):
+                rendered = self.__render_adaptive_card_body(plan, item, root)
+                if budget is not None and not budget.fits(rendered):
+                    budget.omit(len(data) - index)
+                    break
+                result.append(rendered)
+            return result
+
+        result = []
+        if budget is None:
+            for render_element in plan:
+                render_element(data, root, result, None)
             return result
-        else:
-            for element in template:
-                cloned_element = copy.deepcopy(element)
-
-                if cloned_element["type"] == ElementType.TEXTBLOCK.value:
-                    text = cloned_element["text"]
-                    text = self.__evaluate_if_expression(text, data)
-                    text = self.__evaluate_jsonStringify_expression(text, data)
-                    keys = self.__get_template_keys(text)
-                    for key in keys:
-                        value = self.__evaluate_variable_value(key, data)
-                        if value is None:
-                            continue
-                        str_value = str(value)
-                        text = text.replace(f"${{{key}}}", str_value)
-                    cloned_element["text"] = text
-                    result.append(cloned_element)
-                elif cloned_element["type"] ==  ElementType.CONTAINER.value:
-                    array_data = cloned_element.get("$data", None)
-
-                    if not array_data:
-                        result.append(cloned_element)
-                        continue
-
-                    data_key = self.__get_template_keys(array_data)[0]
-                    items_array =  self.__render_adaptive_card_body(cloned_element["items"], data[data_key])
-                    for item in items_array:
-                        cloned_container = copy.deepcopy(cloned_element)
-                        cloned_container["items"] = item
-                        del cloned_container["$data"]
-                        result.append(cloned_container)
-                elif cloned_element["type"] == ElementType.IMAGE.value:
-                    when = cloned_element.get("$when", None)
-                    visible = True
-                    if when:
-                        visible = self.__evaluate_boolean_expression(when, data)
-
-                    if visible:
-                        image_url = cloned_element["url"]
-                        keys = self.__get_template_keys(image_url)
-                        for key in keys:
-                            str_value = str(self.__get_nested_property_value(data, key, default=key))
-                            image_url = image_url.replace(f"${{{key}}}", str_value)
-                        cloned_element["url"] = image_url
-                        del cloned_element["$when"]
-                        result.append(cloned_element)
+
+        # static elements are rendered and charged first, so the ones after the items are kept too
+        static = {}
+        for index, render_element in enumerate(plan):
+            if not getattr(render_element, "repeated", False):
+                static[index] = []
+                render_element(data, root, static[index], None)
+                budget.charge(static[index])
+        for index, render_element in enumerate(plan):
+            if index in static:
+                result.extend(static[index])
+            else:
+                render_element(data, root, result, budget)
         return result
 
-   
+    def __compile_adaptive_card_body(self, template):
+        return [self.__compile_element(element) for element in template]
+
+    def __compile_element(self, element):
+        element_type = element["type"]
+
+        if element_type == ElementType.TEXTBLOCK.value:
+            render_text = self.__compile_text(element["text"])
+
+            def render_text_block(data, root, result, budget):
+                result.append({**element, "text": render_text(data, root)})
+
+            return render_text_block
+
+        if element_type == ElementType.CONTAINER.value:
+            array_data = element.get("$data", None)
+
+            if not array_data:
+                def render_static_container(data, root, result, budget):
+                    result.append(element)
+
+                return render_static_container
+
+            data_key = self.__get_template_keys(array_data)[0]
+            items_plan = self.__compile_adaptive_card_body(element["items"])
+            container = {k: v for k, v in element.items() if k != "$data"}
+
+            def render_data_container(data, root, result, budget):
+                array = data[data_key]
+                if isinstance(array, list):
+                    # items are rendered one at a time so the ones over budget are never rendered
+                    items = (self.__render_adaptive_card_body(items_plan, item, root) for item in array)
+                else:
+                    items = self.__render_adaptive_card_body(items_plan, array, root)
+                    array = items
+                for index, item in enumerate(items):
+                    cloned_container = {**container, "items": item}
+                    if budget is not None and not budget.fits(cloned_container):
+                        budget.omit(len(array) - index)
+                        return
+                    result.append(cloned_container)
+
+            render_data_container.repeated = True
+            return render_data_container
+
+        if element_type == ElementType.IMAGE.value:
+            when = element.get("$when", None)
+            is_visible = self.__compile_boolean_expression(when) if when else None
+            render_url = self.__compile_url(element["url"])
+            image = {k: v for k, v in element.items() if k != "$when"}
+
+            def render_image(data, root, result, budget):
+                if is_visible is not None and not is_visible(data, root):
+                    return
+                result.append({**image, "url": render_url(data, root)})
+
+            return render_image
+
+        # other element types are not rendered
+        def skip(data, root, result, budget):
+            pass
+
+        return skip
+
     def __remove_space_in_expression(self, template_str):
         # removes whitespace outside of quoted strings in the template string.
         def replace_whitespace(match):
-            pattern = r'(["\'].*?["\'])|(\s+)'
-
             def process_match(inner_match):
                 # If the match is a quoted string, return it unchanged.
                 if inner_match.group(1):
@@ -98,89 +215,135 @@ class AdaptiveCardRenderer:
                 # Otherwise, it's whitespace outside quotes, so remove it.
                 else:
                     return ''
-            return re.sub(pattern, process_match, match.group(0))
-        return re.sub(r'\$\{[^}]*\}', replace_whitespace, template_str)
+            return QUOTED_OR_WHITESPACE_PATTERN.sub(process_match, match.group(0))
+        return EXPRESSION_PATTERN.sub(replace_whitespace, template_str)
 
-    def __evaluate_boolean_expression(self, expression, data):
-        # Only support expression like ${image!=null&&image!=''} in Image element
-        match = re.match(r"\$\{(\w+)!=null&&\w+!=''\}", expression)
-        if not match:
-            return True
+    def __compile_text(self, text):
+        # splits the text into literal parts and evaluators of its ${...} expressions
+        parts = []
+        position = 0
+        for match in TEXT_EXPRESSION_PATTERN.finditer(text):
+            if match.start() > position:
+                parts.append(text[position:match.start()])
+            condition_var, true_var, false_var, stringify_var, key = match.groups()
+            if condition_var is not None:
+                parts.append(self.__compile_if_expression(condition_var, true_var, false_var))
+            elif stringify_var is not None:
+                parts.append(self.__compile_jsonStringify_expression(stringify_var))
+            else:
+                parts.append(self.__compile_template_key(key, match.group(0)))
+            position = match.end()
+        if position < len(text):
+            parts.append(text[position:])
 
-        variable = match.group(1)
+        if all(isinstance(part, str) for part in parts):
+            static_text = "".join(parts)
+            return lambda data, root: static_text
 
-        variable = self.__evaluate_variable_value(variable, data)
-        
-        return variable is not None and variable != ''
+        def render_text(data, root):
+            return "".join(part if isinstance(part, str) else part(data, root) for part in parts)
 
-    def __evaluate_if_expression(self, input_str, data):
-        # Only support expression like ${if(data,data,'value')} in TextBlock element
-        pattern = r"\$\{if\(([^,]+),([^,]+),([^)]+)\)\}"
+        return render_text
 
-        def eval_match(match):
-            condition_var, true_var, false_var = match.groups()
-            condition_result = self.__evaluate_variable_value(condition_var, data)
-            if condition_result:
-                true_value = self.__evaluate_variable_value(true_var, data)
-                return str(true_value)
-            else:
-                false_value = self.__evaluate_variable_value(false_var, data)
-                return str(false_value)
+    def __compile_url(self, url):
+        # url keys are property paths only, unresolved keys are replaced by their own name
+        parts = []
+        position = 0
+        for match in re.finditer(TEMPLATE_KEY_PATTERN, url):
+            if match.start() > position:
+                parts.append(url[position:match.start()])
+            key = match.group(1)
+            get_value = self.__compile_nested_property(key, default=key)
+            parts.append(lambda data, root, get_value=get_value: str(get_value(data, root)))
+            position = match.end()
+        if position < len(url):
+            parts.append(url[position:])
+
+        def render_url(data, root):
+            return "".join(part if isinstance(part, str) else part(data, root) for part in parts)
 
-        result_str = re.sub(pattern, eval_match, input_str)
+        return render_url
 
-        return result_str
+    def __compile_template_key(self, key, expression):
+        get_value = self.__compile_variable(key)
 
-    def __evaluate_jsonStringify_expression(self, expression, data):
-        # Only support expression like ${jsonStringify(data)} in Image element
-        pattern = r"\$\{jsonStringify\(([^\)]+)\)\}"
+        def evaluate(data, root):
+            value = get_value(data, root)
+            # unresolved expressions are left as they are
+            return expression if value is None else str(value)
 
-        def eval_match(match):
-            value = match.groups()[0]
-            return json.dumps(self.__get_nested_property_value(data, value))
-        
-        result_str = re.sub(pattern, eval_match, expression)
-        return result_str
+        return evaluate
+
+    def __compile_boolean_expression(self, expression):
+        match = BOOLEAN_EXPRESSION_PATTERN.match(expression)
+        if not match:
+            return lambda data, root: True
+
+        get_value = self.__compile_variable(match.group(1))
+
+        def evaluate(data, root):
+            value = get_value(data, root)
+            return value is not None and value != ''
+
+        return evaluate
+
+    def __compile_if_expression(self, condition_var, true_var, false_var):
+        get_condition = self.__compile_variable(condition_var)
+        get_true_value = self.__compile_variable(true_var)
+        get_false_value = self.__compile_variable(false_var)
+
+        def evaluate(data, root):
+            if get_condition(data, root):
+                return str(get_true_value(data, root))
+            return str(get_false_value(data, root))
+
+        return evaluate
+
+    def __compile_jsonStringify_expression(self, value):
+        get_value = self.__compile_nested_property(value)
+        return lambda data, root: json.dumps(get_value(data, root))
 
     def __is_quoted_str(self, value):
         return value[0] == value[-1] and value[0] in ("'", '"')
 
-    def __evaluate_variable_value(self, variable, data, default=None):
+    def __compile_variable(self, variable, default=None):
         if self.__is_quoted_str(variable):
-            return variable[1:-1]
+            literal = variable[1:-1]
+            return lambda data, root: literal
         elif variable == "true":
-            return True
+            return lambda data, root: True
         elif variable == "false":
-            return False
+            return lambda data, root: False
         elif self.__is_array_index_access_variable(variable):
             array_index = int(variable[variable.index("[")+1:variable.index("]")])
-            variable = variable[:variable.index("[")]
-            return self.__get_nested_property_value(data, variable, default)[array_index]
+            get_array = self.__compile_nested_property(variable[:variable.index("[")], default)
+            return lambda data, root: get_array(data, root)[array_index]
 
-        return self.__get_nested_property_value(data, variable, default)
+        return self.__compile_nested_property(variable, default)
 
     def __is_array_index_access_variable(self, variable):
-        return bool(re.search(r'\[\d+\]$', variable))
-
+        return bool(ARRAY_INDEX_PATTERN.search(variable))
 
     def __get_template_keys(self, text):
-        pattern = r"\${(.*?)}"
-        keys = re.findall(pattern, text)
-        return keys
+        return re.findall(TEMPLATE_KEY_PATTERN, text)
 
-    def __get_nested_property_value(self, data, property_str, default=None):
+    def __compile_nested_property(self, property_str, default=None):
         if property_str == "$data":
-            return data
-        
+            return lambda data, root: data
+
         keys = property_str.split('.')
-        
-        if keys[0] == "$root":
+        from_root = keys[0] == "$root"
+        if from_root:
             keys = keys[1:]
-            data = self.root
 
-        try:
-            for key in keys:
-                data = data[key]
-            return data
-        except KeyError:
-            return default
+        def get_value(data, root):
+            if from_root:
+                data = root
+            try:
+                for key in keys:
+                    data = data[key]
+                return data
+            except KeyError:
+                return default
+
+        return get_value
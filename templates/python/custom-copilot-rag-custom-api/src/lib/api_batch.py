@@ -0,0 +1,116 @@
+import asyncio
+import typing
+from dataclasses import dataclass, field
+
+from botbuilder.core import TurnContext
+
+from .requests_openapi import OpenAPIClient
+
+TURN_STATE_KEY = "apiBatch"
+
+
+@dataclass
+class ApiCall:
+    operation_id: str
+    kwargs: dict[str, typing.Any] = field(default_factory=dict)
+
+
+@dataclass
+class ApiCallResult:
+    call: ApiCall
+    response: typing.Optional[typing.Any] = None
+    error: typing.Optional[BaseException] = None
+
+
+class ApiBatch(object):
+    """
+    Collects the API calls planned during a turn and issues them concurrently under a
+    shared deadline, so the turn takes as long as the slowest call instead of their sum.
+    Calls go through `Operation.acall_json` with the batch's `max_items`/`max_bytes` limits.
+
+    `start` sends the queued calls without waiting for them, and `result` waits for the
+    outcome of one of them, so the actions of a plan can each get their own result while
+    the calls run together. The results collected so far are kept in `results`.
+    """
+
+    def __init__(
+        self,
+        client: OpenAPIClient,
+        timeout: typing.Optional[float] = None,
+        max_items: typing.Optional[int] = None,
+        max_bytes: typing.Optional[int] = None,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.calls: list[ApiCall] = []
+        self.results: list[ApiCallResult] = []
+        self._started: list[tuple[ApiCall, asyncio.Future]] = []
+
+    def add(self, operation_id: str, **kwargs):
+        self.calls.append(ApiCall(operation_id, kwargs))
+
+    def start(self):
+        """Sends every queued call, each one bounded by the batch timeout."""
+        calls, self.calls = self.calls, []
+        for call in calls:
+            self._started.append((call, asyncio.ensure_future(self._run(call))))
+
+    async def result(self, operation_id: str, **kwargs) -> ApiCallResult:
+        """
+        Waits for the started call with these arguments, or sends it when there is none.
+        Each started call is handed out once.
+        """
+        for i, (call, task) in enumerate(self._started):
+            if call.operation_id == operation_id and call.kwargs == kwargs:
+                del self._started[i]
+                break
+        else:
+            task = asyncio.ensure_future(self._run(ApiCall(operation_id, kwargs)))
+        result = await task
+        self.results.append(result)
+        return result
+
+    async def execute(self) -> list[ApiCallResult]:
+        """Runs every queued or started call, returning one result per call in the order they were added."""
+        self.start()
+        started, self._started = self._started, []
+        results = list(await asyncio.gather(*(task for _, task in started)))
+        self.results.extend(results)
+        return results
+
+    async def cancel(self):
+        """Cancels the started calls whose result was not asked for."""
+        started, self._started = self._started, []
+        self.calls = []
+        for _, task in started:
+            task.cancel()
+        # let the cancelled calls release their connections before returning
+        await asyncio.gather(*(task for _, task in started), return_exceptions=True)
+
+    async def _run(self, call: ApiCall) -> ApiCallResult:
+        try:
+            # wait_for waits for the call to finish cancelling when it times out
+            response = await asyncio.wait_for(self._call(call), self.timeout)
+        except asyncio.TimeoutError:
+            return ApiCallResult(call, error=asyncio.TimeoutError(f"no response within {self.timeout} seconds"))
+        except Exception as error:
+            return ApiCallResult(call, error=error)
+        return ApiCallResult(call, response=response)
+
+    async def _call(self, call: ApiCall):
+        operation = getattr(self.client, call.operation_id)
+        return await operation.acall_json(max_items=self.max_items, max_bytes=self.max_bytes, **call.kwargs)
+
+
+def get_turn_batch(context: TurnContext, client: OpenAPIClient, **options) -> ApiBatch:
+    """Returns the batch of the current turn, creating it on first use."""
+    batch = context.turn_state.get(TURN_STATE_KEY)
+    if batch is None:
+        batch = context.turn_state[TURN_STATE_KEY] = ApiBatch(client, **options)
+    return batch
+
+
+def pop_turn_batch(context: TurnContext) -> typing.Optional[ApiBatch]:
+    return context.turn_state.pop(TURN_STATE_KEY, None)
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import typing
+
+from .adaptive_card_renderer import AdaptiveCardRenderer
+
+CARD_SUFFIX = ".json"
+# mock data generated next to the card templates, not templates themselves
+CARD_DATA_SUFFIX = ".data.json"
+ACTIONS_FILE_NAME = "actions.json"
+
+log = logging.getLogger(__name__)
+
+
+class AssetRegistry(object):
+    """
+    Keeps the adaptive card templates and action manifests of the bot in memory.
+
+    Card templates in `cards_dir` are compiled into renderers by operation id when they are
+    loaded, and the `actions.json` of each prompt folder in `prompts_dir` is kept as text.
+    Files are loaded once, and `start_watching` rescans the folders every `check_interval`
+    seconds in a worker thread: entries whose file modification time changed are reloaded,
+    and deleted files are dropped. Lookups only read the entries loaded so far.
+    """
+
+    def __init__(self, cards_dir: str, prompts_dir: str, check_interval: float = 2.0):
+        self.cards_dir = cards_dir
+        self.prompts_dir = prompts_dir
+        self.check_interval = check_interval
+        self._renderers: dict[str, tuple[int, AdaptiveCardRenderer]] = {}
+        self._actions: dict[str, tuple[int, str]] = {}
+        self._watch_task: typing.Optional[asyncio.Task] = None
+        self.refresh()
+
+    def get_renderer(self, operation_id: str) -> typing.Optional[AdaptiveCardRenderer]:
+        """Returns the renderer of the card template of `operation_id`, None when it has none."""
+        entry = self._renderers.get(operation_id)
+        return entry[1] if entry else None
+
+    def get_actions(self, prompt_name: str = "chat") -> typing.Optional[str]:
+        """Returns the content of the actions.json of the prompt, None when it has none."""
+        entry = self._actions.get(prompt_name)
+        return entry[1] if entry else None
+
+    def refresh(self):
+        """Reloads the files changed since the last refresh. The entries are replaced at once, not updated in place."""
+        self._renderers = self._sync(self._renderers, self._card_files(), self._load_renderer)
+        self._actions = self._sync(self._actions, self._actions_files(), self._read)
+
+    def start_watching(self):
+        """Starts rescanning the folders in the background, until `stop_watching`."""
+        if self._watch_task is None:
+            self._watch_task = asyncio.ensure_future(self._watch())
+
+    async def stop_watching(self):
+        task, self._watch_task = self._watch_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await loop.run_in_executor(None, self.refresh)
+            except Exception as e:
+                log.warning(f"failed to reload the cards and actions: {e}")
+
+    def _card_files(self):
+        for entry in self._scan(self.cards_dir):
+            name = entry.name
+            if entry.is_file() and name.endswith(CARD_SUFFIX) and not name.endswith(CARD_DATA_SUFFIX):
+                yield name[: -len(CARD_SUFFIX)], entry.path, entry.stat().st_mtime_ns
+
+    def _actions_files(self):
+        for entry in self._scan(self.prompts_dir):
+            if not entry.is_dir():
+                continue
+            path = os.path.join(entry.path, ACTIONS_FILE_NAME)
+            try:
+                yield entry.name, path, os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+    def _scan(self, directory: str):
+        try:
+            with os.scandir(directory) as entries:
+                return list(entries)
+        except FileNotFoundError:
+            return []
+
+    def _sync(self, entries: dict, files, load: typing.Callable[[str], typing.Any]) -> dict:
+        synced = {}
+        for key, path, mtime in files:
+            entry = entries.get(key)
+            synced[key] = entry if entry is not None and entry[0] == mtime else (mtime, load(path))
+        return synced
+
+    def _read(self, path: str) -> str:
+        with open(path) as f:
+            return f.read()
+
+    def _load_renderer(self, path: str) -> AdaptiveCardRenderer:
+        renderer = AdaptiveCardRenderer(self._read(path))
+        try:
+            renderer.compile()
+        except Exception as e:
+            # rendering an invalid template falls back to the template itself
+            log.warning(f"invalid card template '{path}': {e}")
+        return renderer
@@ -0,0 +1,306 @@
+import codecs
+import json
+import re
+import typing
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]+")
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# what the parser expects next
+_VALUE, _KEY, _COLON, _COMMA_OR_END = range(4)
+
+
+class _Frame(object):
+    __slots__ = ("container", "is_array", "keep", "count", "key")
+
+    def __init__(self, container, is_array: bool, keep: bool):
+        self.container = container
+        self.is_array = is_array
+        self.keep = keep
+        self.count = 0
+        self.key = None
+
+
+class JSONStreamParser(object):
+    """
+    An incremental JSON parser fed with text chunks.
+
+    The top-level array keeps at most `max_items` items: once it is full the parser is done
+    without waiting for the rest of the document. Nested arrays are kept whole. Only the
+    unparsed tail of the input is buffered, and a string split across chunks is scanned once.
+    """
+
+    def __init__(self, max_items: typing.Optional[int] = None):
+        self.max_items = max_items
+        self.done = False
+        self.truncated = False
+        self.peak_buffer_size = 0
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._expect = _VALUE
+        self._root = None
+        # how far the string starting at `_pos` was scanned without finding its end
+        self._string_scanned = 0
+
+    def feed(self, text: str):
+        if self.done:
+            return
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+        self.peak_buffer_size = max(self.peak_buffer_size, len(self._buffer))
+        self._parse(final=False)
+
+    def close(self, complete: bool = True):
+        """
+        Finishes parsing. When `complete` is False the input was cut short on purpose:
+        open arrays are closed, and the partially received value and object are dropped.
+        """
+        if not self.done:
+            self._parse(final=complete)
+        if not self.done:
+            self._drop_open_object()
+            self.truncated = True
+            self.done = True
+
+    @property
+    def result(self):
+        return self._root
+
+    def _parse(self, final: bool):
+        buf = self._buffer
+        while not self.done:
+            pos = _WHITESPACE.match(buf, self._pos).end()
+            self._pos = pos
+            if pos >= len(buf):
+                break
+            c = buf[pos]
+            expect = self._expect
+            if expect == _VALUE:
+                if c == "{" or c == "[":
+                    self._push(c == "[")
+                    self._pos = pos + 1
+                elif c == "]" and self._stack and self._stack[-1].is_array and not self._stack[-1].count:
+                    self._pop()
+                    self._pos = pos + 1
+                elif c == '"':
+                    end = self._string_end(buf, pos)
+                    if end is None:
+                        break
+                    keep = self._keeping()
+                    self._pos = end
+                    self._add(json.loads(buf[pos:end]) if keep else None, keep)
+                else:
+                    m = _NUMBER_CHARS.match(buf, pos)
+                    if m:
+                        end = m.end()
+                        if end < len(buf) or final:
+                            if not _NUMBER.fullmatch(m.group()):
+                                raise ValueError(f"invalid number {m.group()!r} at position {pos}")
+                            value = json.loads(m.group())
+                    else:
+                        for literal, value in _LITERALS.items():
+                            if buf.startswith(literal, pos):
+                                end = pos + len(literal)
+                                break
+                        else:
+                            if len(buf) - pos < 5 and not final:
+                                break
+                            raise ValueError(f"unexpected character {c!r} at position {pos}")
+                    # a number or literal may continue in the next chunk
+                    if end >= len(buf) and not final:
+                        break
+                    self._pos = end
+                    self._add(value)
+            elif expect == _COMMA_OR_END:
+                frame = self._stack[-1]
+                self._pos = pos + 1
+                if c == ",":
+                    if len(self._stack) == 1 and self._full(frame):
+                        # nothing else to read once the top-level array is full
+                        self.truncated = True
+                        self.done = True
+                    self._expect = _VALUE if frame.is_array else _KEY
+                elif c == ("]" if frame.is_array else "}"):
+                    self._pop()
+                else:
+                    raise ValueError(f"unexpected character {c!r} at position {pos}")
+            elif expect == _KEY:
+                if c == "}" and not self._stack[-1].count:
+                    self._pop()
+                    self._pos = pos + 1
+                    continue
+                if c != '"':
+                    raise ValueError(f"expecting property name at position {pos}")
+                end = self._string_end(buf, pos)
+                if end is None:
+                    break
+                self._stack[-1].key = json.loads(buf[pos:end])
+                self._pos = end
+                self._expect = _COLON
+            elif expect == _COLON:
+                if c != ":":
+                    raise ValueError(f"expecting ':' at position {pos}")
+                self._pos = pos + 1
+                self._expect = _VALUE
+        if final and not self.done:
+            raise ValueError("incomplete JSON document")
+
+    def _string_end(self, buf: str, pos: int) -> typing.Optional[int]:
+        """Returns the index after the string starting at `pos`, or None when it is not complete yet."""
+        i = pos + 1 + self._string_scanned
+        while True:
+            i = buf.find('"', i)
+            if i < 0:
+                # resume after the scanned part with the next chunk instead of from the opening quote
+                self._string_scanned = len(buf) - pos - 1
+                return None
+            backslashes = 0
+            while buf[i - 1 - backslashes] == "\\":
+                backslashes += 1
+            if backslashes % 2 == 0:
+                self._string_scanned = 0
+                return i + 1
+            i += 1
+
+    def _full(self, frame: _Frame) -> bool:
+        return (
+            frame.is_array
+            and self.max_items is not None
+            and frame is self._stack[0]
+            and frame.count >= self.max_items
+        )
+
+    def _keeping(self) -> bool:
+        if not self._stack:
+            return True
+        frame = self._stack[-1]
+        return frame.keep and not self._full(frame)
+
+    def _push(self, is_array: bool):
+        keep = self._keeping()
+        container = ([] if is_array else {}) if keep else None
+        # attach containers right away so a document cut short keeps its partial content
+        self._add(container, keep)
+        self._stack.append(_Frame(container, is_array, keep))
+        self._expect = _VALUE if is_array else _KEY
+
+    def _pop(self):
+        self._stack.pop()
+        self._expect = _COMMA_OR_END
+        if not self._stack:
+            self.done = True
+
+    def _drop_open_object(self):
+        # an object cut short misses some of its properties, drop it rather than pass it on
+        for depth in range(1, len(self._stack)):
+            frame = self._stack[depth]
+            if frame.is_array or not frame.keep:
+                continue
+            parent = self._stack[depth - 1]
+            if parent.is_array:
+                parent.container.pop()
+            else:
+                del parent.container[parent.key]
+            return
+
+    def _add(self, value, keep: bool = True):
+        self._expect = _COMMA_OR_END
+        if not self._stack:
+            self._root = value
+            self.done = not isinstance(value, (list, dict))
+            return
+        frame = self._stack[-1]
+        if frame.is_array:
+            if self._full(frame):
+                self.truncated = True
+            elif frame.keep and keep:
+                frame.container.append(value)
+        elif frame.keep and keep:
+            frame.container[frame.key] = value
+        frame.count += 1
+
+
+class StreamedJSONResponse(object):
+    """
+    The outcome of a streaming, size-capped call: response metadata plus the parsed
+    (possibly truncated) JSON `data`, or the raw `text` for non-JSON responses.
+    """
+
+    def __init__(self, status_code: int, reason: str, headers):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.data = None
+        self.raw_text: typing.Optional[str] = None
+        self.truncated = False
+        self.bytes_read = 0
+        self.peak_buffer_size = 0
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def is_json(self):
+        return self.raw_text is None
+
+    @property
+    def text(self):
+        if self.raw_text is not None:
+            return self.raw_text
+        return json.dumps(self.data)
+
+    def json(self):
+        return self.data
+
+    def __repr__(self):
+        return f"<{type(self).__name__} [{self.status_code}] read={self.bytes_read} truncated={self.truncated}>"
+
+
+class JSONStreamReader(object):
+    """Feeds response body chunks into a `JSONStreamParser`, stopping at the item or byte limits."""
+
+    def __init__(
+        self,
+        response: StreamedJSONResponse,
+        max_items: typing.Optional[int] = None,
+        max_bytes: typing.Optional[int] = None,
+    ):
+        self.response = response
+        self.max_bytes = max_bytes
+        content_type = (response.headers.get("Content-Type") or "").lower()
+        self._parser = JSONStreamParser(max_items) if "json" in content_type else None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._raw_parts: list[str] = []
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consumes a chunk, returns False once no more input is needed."""
+        response = self.response
+        if self.max_bytes is not None and response.bytes_read + len(chunk) > self.max_bytes:
+            chunk = chunk[: self.max_bytes - response.bytes_read]
+            response.truncated = True
+        response.bytes_read += len(chunk)
+        text = self._decoder.decode(chunk)
+        if self._parser is None:
+            self._raw_parts.append(text)
+        else:
+            self._parser.feed(text)
+            if self._parser.done:
+                return False
+        return not response.truncated
+
+    def close(self) -> StreamedJSONResponse:
+        response = self.response
+        if self._parser is None:
+            response.raw_text = "".join(self._raw_parts) + self._decoder.decode(b"", final=True)
+            response.peak_buffer_size = len(response.raw_text)
+            return response
+        self._parser.feed(self._decoder.decode(b"", final=True))
+        self._parser.close(complete=not response.truncated)
+        response.data = self._parser.result
+        response.truncated = response.truncated or self._parser.truncated
+        response.peak_buffer_size = self._parser.peak_buffer_size
+        return response
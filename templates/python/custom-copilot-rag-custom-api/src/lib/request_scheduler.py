@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import typing
+
+COALESCIBLE_METHODS = ("get", "head", "options")
+
+
+class _SyncCall(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: typing.Optional[BaseException] = None
+
+
+class _Flight(object):
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class RequestScheduler(object):
+    """
+    Controls how operation calls reach the backend hosts.
+
+    Identical concurrent calls of idempotent operations are coalesced into a single
+    upstream request whose response is shared by every caller (single-flight), and
+    the number of in-flight requests per host is limited to `max_per_host`. Callers
+    beyond the limit are queued until a slot is free. A shared request is cancelled
+    once every caller waiting for it has been cancelled, which frees its host slot.
+
+    The default limit matches the per-host connection pool size of `requests.Session`.
+    """
+
+    def __init__(self, max_per_host: typing.Optional[int] = 10, coalesce: bool = True):
+        if max_per_host is not None and max_per_host < 1:
+            raise ValueError("max_per_host should be a positive integer or None")
+        self.max_per_host = max_per_host
+        self.coalesce = coalesce
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[typing.Hashable, _Flight] = {}
+        self._sync_inflight: dict[typing.Hashable, _SyncCall] = {}
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._sync_host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+
+    def can_coalesce(self, method: str) -> bool:
+        return self.coalesce and method.lower() in COALESCIBLE_METHODS
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight) + len(self._sync_inflight),
+        }
+
+    async def run(
+        self,
+        key: typing.Optional[typing.Hashable],
+        host: str,
+        send: typing.Callable[[], typing.Awaitable[typing.Any]],
+    ):
+        """Awaits `send()` under the host limit, sharing the result with concurrent calls of the same key."""
+        if key is None:
+            return await self._run_limited(host, send)
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            # the upstream call runs in its own task so cancelling one waiter does not cancel the others
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(self._run_limited(host, send)))
+            flight.task.add_done_callback(lambda _: self._on_done(key, flight))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # the last waiter left: stop the upstream call and wait until it has released its slot
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+                await asyncio.wait([flight.task])
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def run_sync(
+        self,
+        key: typing.Optional[typing.Hashable],
+        host: str,
+        send: typing.Callable[[], typing.Any],
+    ):
+        """Thread-safe counterpart of `run` for the blocking requestor."""
+        if key is None:
+            return self._run_limited_sync(host, send)
+        with self._lock:
+            call = self._sync_inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._sync_inflight[key] = _SyncCall()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self._run_limited_sync(host, send)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._sync_inflight[key]
+            call.event.set()
+
+    def _on_done(self, key, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        # mark the exception as retrieved in case every waiter has been cancelled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    async def _run_limited(self, host: str, send):
+        if self.max_per_host is None:
+            return await send()
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        async with semaphore:
+            return await send()
+
+    def _run_limited_sync(self, host: str, send):
+        if self.max_per_host is None:
+            return send()
+        with self._lock:
+            semaphore = self._sync_host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._sync_host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+        with semaphore:
+            return send()
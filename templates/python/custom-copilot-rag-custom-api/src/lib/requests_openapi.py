@@ -1,10 +1,14 @@
 # This code is coming from https://github.com/wy-z/requests-openapi
 
+import contextlib
 import copy
 import functools
+import json
 import logging
 import pprint
+import string
 import typing
+import urllib.parse
 
 import jsonref
 import openapi_pydantic as openapi
@@ -17,7 +21,12 @@ except ImportError:
     from yaml import Loader as yaml_loader
 
 import abc
-import requests
+import aiohttp
+
+from . import spec_snapshot
+from .json_stream import JSONStreamReader, StreamedJSONResponse
+from .request_scheduler import RequestScheduler
+from .response_cache import ResponseCache
 
 
 class Requestor(abc.ABC):
@@ -28,6 +37,124 @@ class Requestor(abc.ABC):
 Requestor.register(requests.Session)
 
 
+class AsyncStreamingResponse(object):
+    """A response whose body has not been read yet, consumed through the `chunks` async iterator."""
+
+    def __init__(self, status_code: int, reason: str, headers, chunks: typing.AsyncIterator[bytes]):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.chunks = chunks
+
+
+class AsyncRequestor(abc.ABC):
+    @abc.abstractmethod
+    async def request(self, method, url, params={}, headers={}, cookies={}, **kwargs):
+        pass
+
+    async def close(self):
+        """Releases the connections of the requestor, nothing to release by default."""
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, params={}, headers={}, cookies={}, **kwargs):
+        # requestors without streaming support hand out their buffered response as a single chunk
+        resp = await self.request(method, url, params=params, headers=headers, cookies=cookies, **kwargs)
+
+        async def chunks():
+            yield resp.content
+
+        yield AsyncStreamingResponse(resp.status_code, resp.reason, resp.headers, chunks())
+
+
+class AsyncResponse(object):
+    """
+    A fully read response returned by `AiohttpRequestor`, exposing the subset of
+    `requests.Response` used by the bot (`status_code`, `reason`, `text`, `json()`).
+    """
+
+    def __init__(self, status_code: int, reason: str, headers, content: bytes, encoding=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} [{self.status_code}]>"
+
+
+class AiohttpRequestor(AsyncRequestor):
+    """
+    Default `AsyncRequestor` backed by a shared `aiohttp.ClientSession`.
+    The session is created lazily so the requestor can be built outside of an event loop.
+    """
+
+    def __init__(self, session: typing.Optional[aiohttp.ClientSession] = None):
+        self._session = session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    @staticmethod
+    def _to_query(params):
+        # keep the same encoding as requests: drop None, repeat keys for lists
+        query = []
+        for k, v in (params or {}).items():
+            for item in v if isinstance(v, (list, tuple)) else [v]:
+                if item is None:
+                    continue
+                if isinstance(item, bool) or not isinstance(item, (str, int, float)):
+                    item = str(item)
+                query.append((k, item))
+        return query
+
+    def _send(self, method, url, params, headers, cookies, kwargs):
+        timeout = kwargs.pop("timeout", None)
+        if timeout is not None and not isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return self.session.request(
+            method,
+            url,
+            params=self._to_query(params),
+            headers={k: str(v) for k, v in (headers or {}).items() if v is not None},
+            cookies=cookies or None,
+            **kwargs,
+        )
+
+    async def request(self, method, url, params={}, headers={}, cookies={}, **kwargs):
+        async with self._send(method, url, params, headers, cookies, kwargs) as resp:
+            content = await resp.read()
+            return AsyncResponse(resp.status, resp.reason, resp.headers, content, resp.get_encoding())
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, params={}, headers={}, cookies={}, chunk_size=64 * 1024, **kwargs):
+        # leaving the context before the body is fully read closes the connection instead of draining it
+        async with self._send(method, url, params, headers, cookies, kwargs) as resp:
+            yield AsyncStreamingResponse(
+                resp.status, resp.reason, resp.headers, resp.content.iter_chunked(chunk_size)
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
 log = logging.getLogger(__name__)
 
 OPENAPI_KEY_PATHS = "paths"
@@ -52,13 +179,29 @@ class Server(openapi.Server):
         return obj
 
 
+class BindingPlan(typing.NamedTuple):
+    """Per-operation request binding compiled once from the spec."""
+
+    raw_server_url: str
+    host: str
+    # parameter name -> openapi.ParameterLocation
+    locations: dict[str, openapi.ParameterLocation]
+    path_params: tuple[str, ...]
+    # (literal, path param name) pairs of the url template, server url included
+    url_parts: tuple[tuple[str, typing.Optional[str]], ...]
+
+
 class Operation(object):
     INTERNAL_PARAM_PREFIX = "_"
+    CACHE_EXTENSION = "x-cache"
 
     path: str
     method: str
     spec: openapi.Operation
     requestor: Requestor
+    async_requestor: typing.Optional[AsyncRequestor]
+    cache: typing.Optional[ResponseCache]
+    scheduler: typing.Optional[RequestScheduler]
     req_opts: dict[str, typing.Any]
     server: Server
     # https://swagger.io/specification/#path-item-object parameters
@@ -72,6 +215,9 @@ class Operation(object):
         *,
         requestor: Requestor,
         server: Server,
+        async_requestor: typing.Optional[AsyncRequestor] = None,
+        cache: typing.Optional[ResponseCache] = None,
+        scheduler: typing.Optional[RequestScheduler] = None,
         req_opts={},
         parent_params: list[openapi.Parameter] = [],
     ):
@@ -79,9 +225,40 @@ class Operation(object):
         self.method = method
         self.spec = spec
         self.requestor = requestor
+        self.async_requestor = async_requestor
         self.server = server
         self.req_opts = req_opts
         self.parent_params = parent_params
+        self._binding_plan = None
+        self.scheduler = scheduler
+        self.set_cache(cache)
+
+    def set_cache(self, cache: typing.Optional[ResponseCache]):
+        self.cache = cache
+        self.cache_ttl = (
+            cache.policy(self.method, (self.spec.model_extra or {}).get(self.CACHE_EXTENSION))
+            if cache is not None
+            else None
+        )
+
+    def rebind(
+        self,
+        *,
+        requestor: Requestor,
+        server: Server,
+        async_requestor: typing.Optional[AsyncRequestor] = None,
+        cache: typing.Optional[ResponseCache] = None,
+        scheduler: typing.Optional[RequestScheduler] = None,
+    ):
+        """Points the operation to new client settings without rebuilding it from the spec."""
+        self.requestor = requestor
+        self.async_requestor = async_requestor
+        self.scheduler = scheduler
+        if server is not self.server:
+            self.server = server
+            self._binding_plan = None
+        if cache is not self.cache:
+            self.set_cache(cache)
 
     @property
     def operation_id(self):
@@ -90,47 +267,163 @@ class Operation(object):
     def gen_url(self, **kwargs):
         return self.server.get_url() + self.path.format(**kwargs)
 
-    @functools.cache
-    def _gen_call(self):
-        def f(**kwargs):
-            # collect api params
-            path_params, params, headers, cookies = {}, {}, {}, {}
-            for spec in (self.spec.parameters or []) + (self.parent_params or []):
-                _in = spec.param_in
-                name = spec.name
-                # path param is required
-                if name not in kwargs:
-                    if _in == openapi.ParameterLocation.PATH:
-                        raise ValueError(f"path param '{name}' is required")
-                    continue
-                # collect params
-                if _in == openapi.ParameterLocation.PATH:
-                    path_params[name] = kwargs.pop(name)
-                elif _in == openapi.ParameterLocation.QUERY:
-                    params[name] = kwargs.pop(name)
-                elif _in == openapi.ParameterLocation.HEADER:
-                    headers[name] = kwargs.pop(name)
-                elif _in == openapi.ParameterLocation.COOKIE:
-                    cookies[name] = kwargs.pop(name)
+    def _compile(self) -> "BindingPlan":
+        locations = {}
+        # operation level parameters override path item level ones
+        for spec in (self.spec.parameters or []) + (self.parent_params or []):
+            locations.setdefault(spec.name, spec.param_in)
+        path_params = tuple(
+            name
+            for name, _in in locations.items()
+            if _in == openapi.ParameterLocation.PATH
+        )
+        server_url = self.server.get_url()
+        url_parts = []
+        for i, (literal, field, _, _) in enumerate(string.Formatter().parse(self.path)):
+            url_parts.append(((server_url if i == 0 else "") + literal, field))
+        return BindingPlan(
+            raw_server_url=self.server.url,
+            host=urllib.parse.urlsplit(server_url).netloc,
+            locations=locations,
+            path_params=path_params,
+            url_parts=tuple(url_parts) or ((server_url, None),),
+        )
+
+    @property
+    def binding_plan(self) -> "BindingPlan":
+        plan = self._binding_plan
+        # recompile only when the server url has been changed since the last call
+        if plan is None or plan.raw_server_url != self.server.url:
+            plan = self._binding_plan = self._compile()
+        return plan
+
+    def _bind(self, kwargs):
+        """Splits call kwargs into the request url and requestor kwargs."""
+        plan = self.binding_plan
+        path_params, params, headers, cookies = {}, {}, {}, {}
+        collected = {
+            openapi.ParameterLocation.PATH: path_params,
+            openapi.ParameterLocation.QUERY: params,
+            openapi.ParameterLocation.HEADER: headers,
+            openapi.ParameterLocation.COOKIE: cookies,
+        }
+        req_kwargs = {}
+        for k, v in kwargs.items():
+            _in = plan.locations.get(k)
+            if _in is not None:
+                collected[_in][k] = v
             # collect internal params
-            for k in list(kwargs.keys()):
-                if not k.startswith(self.INTERNAL_PARAM_PREFIX):
-                    continue
-                kwargs[k[len(self.INTERNAL_PARAM_PREFIX) :]] = kwargs.pop(k)
-            kwargs.setdefault("params", {}).update(params)
-            kwargs.setdefault("headers", {}).update(headers)
-            kwargs.setdefault("cookies", {}).update(cookies)
-            # set request params
-            for k, v in self.req_opts.items():
-                kwargs.setdefault(k, v)
-            return self.requestor.request(
-                self.method, self.gen_url(**path_params), **kwargs
+            elif k.startswith(self.INTERNAL_PARAM_PREFIX):
+                req_kwargs[k[len(self.INTERNAL_PARAM_PREFIX) :]] = v
+            else:
+                req_kwargs[k] = v
+        # path param is required
+        for name in plan.path_params:
+            if name not in path_params:
+                raise ValueError(f"path param '{name}' is required")
+        req_kwargs.setdefault("params", {}).update(params)
+        req_kwargs.setdefault("headers", {}).update(headers)
+        req_kwargs.setdefault("cookies", {}).update(cookies)
+        # set request params
+        for k, v in self.req_opts.items():
+            req_kwargs.setdefault(k, v)
+        url = "".join(
+            literal if field is None else literal + str(path_params[field])
+            for literal, field in plan.url_parts
+        )
+        return url, req_kwargs
+
+    def _prepare(self, kwargs, mode, *variant):
+        """
+        Binds the call and looks it up in the response cache.
+        Returns (url, kwargs, key, entry); key is None when the call is neither cacheable nor coalescible.
+        `mode` is how the call is sent ("sync", "async" or "json"), whose responses are different objects,
+        and `variant` tells apart calls whose results differ for the same request, such as parsing limits.
+        """
+        url, kwargs = self._bind(kwargs)
+        coalesce = self.scheduler is not None and self.scheduler.can_coalesce(self.method)
+        if self.cache_ttl is None and not coalesce:
+            return url, kwargs, None, None
+        key = (ResponseCache.make_key(self.operation_id, self.method, url, kwargs), mode, *variant)
+        entry = self.cache.get(key) if self.cache_ttl is not None else None
+        if entry is not None and not entry.fresh:
+            kwargs["headers"] = {**kwargs["headers"], **entry.validators()}
+        return url, kwargs, key, entry
+
+    def _store(self, key, resp, entry):
+        if self.cache_ttl is None:
+            return resp
+        return self.cache.update(key, resp, entry, self.cache_ttl)
+
+    def __call__(self, **kwargs):
+        url, kwargs, key, entry = self._prepare(kwargs, "sync")
+        if entry is not None and entry.fresh:
+            return entry.response
+
+        def send():
+            return self._store(key, self.requestor.request(self.method, url, **kwargs), entry)
+
+        if self.scheduler is None:
+            return send()
+        flight_key = key if self.scheduler.can_coalesce(self.method) else None
+        return self.scheduler.run_sync(flight_key, self.binding_plan.host, send)
+
+    async def acall(self, **kwargs):
+        """Awaitable counterpart of `__call__`, sent through the async requestor."""
+        if self.async_requestor is None:
+            raise ValueError("async requestor is required, 'set_async_requestor' first")
+        url, kwargs, key, entry = self._prepare(kwargs, "async")
+        if entry is not None and entry.fresh:
+            return entry.response
+
+        async def send():
+            return self._store(key, await self.async_requestor.request(self.method, url, **kwargs), entry)
+
+        if self.scheduler is None:
+            return await send()
+        flight_key = key if self.scheduler.can_coalesce(self.method) else None
+        return await self.scheduler.run(flight_key, self.binding_plan.host, send)
+
+    async def acall_json(
+        self,
+        *,
+        max_items: typing.Optional[int] = None,
+        max_bytes: typing.Optional[int] = None,
+        **kwargs,
+    ) -> StreamedJSONResponse:
+        """
+        Streaming counterpart of `acall`: the JSON body is parsed while it is received, a top-level array
+        keeps at most `max_items` items and reading stops after `max_bytes` bytes, so memory stays bounded
+        by the limits rather than by the response size. Parsed results are cached and identical calls
+        in flight coalesced like `acall` responses, per pair of limits.
+        """
+        if self.async_requestor is None:
+            raise ValueError("async requestor is required, 'set_async_requestor' first")
+        url, kwargs, key, entry = self._prepare(kwargs, "json", max_items, max_bytes)
+        if entry is not None and entry.fresh:
+            return entry.response
+
+        async def send():
+            async with self.async_requestor.stream(self.method, url, **kwargs) as resp:
+                reader = JSONStreamReader(
+                    StreamedJSONResponse(resp.status_code, resp.reason, resp.headers),
+                    max_items=max_items,
+                    max_bytes=max_bytes,
+                )
+                async for chunk in resp.chunks:
+                    if not reader.feed(chunk):
+                        break
+                result = reader.close()
+            log.debug(
+                f"{self.operation_id}: read {result.bytes_read} bytes, "
+                f"peak buffer {result.peak_buffer_size} chars, truncated={result.truncated}"
             )
+            return self._store(key, result, entry)
 
-        return f
-
-    def __call__(self, *args, **kwargs):
-        return self._gen_call()(*args, **kwargs)
+        if self.scheduler is None:
+            return await send()
+        flight_key = key if self.scheduler.can_coalesce(self.method) else None
+        return await self.scheduler.run(flight_key, self.binding_plan.host, send)
 
     def help(self):
         return pprint.pprint(self.spec.model_dump(), indent=2)
@@ -153,27 +446,56 @@ def load_spec_from_file(file_path):
 
 class OpenAPIClient:
     _requestor: Requestor
+    _async_requestor: AsyncRequestor
+    _cache: typing.Optional[ResponseCache]
+    _scheduler: typing.Optional[RequestScheduler]
     _server: typing.Optional[Server]
     _operations: dict[str, typing.Any]
+    _operation_index: dict[str, list[tuple[str, str]]]
     _raw_spec: dict[str, typing.Any]
     _spec: openapi.OpenAPI
 
     req_opts: dict[str, typing.Any]
+    lazy: bool
 
     def __init__(
         self,
         requestor: typing.Optional[Requestor] = None,
         server: typing.Optional[Server] = None,
         req_opts={},
+        async_requestor: typing.Optional[AsyncRequestor] = None,
+        cache: typing.Optional[ResponseCache] = None,
+        scheduler: typing.Optional[RequestScheduler] = None,
+        lazy: bool = False,
     ):
         self._requestor = requestor or requests.Session()
+        self._async_requestor = async_requestor or AiohttpRequestor()
+        self._cache = cache
+        self._scheduler = scheduler or RequestScheduler()
         self._server = server
         self.req_opts = req_opts
+        # build operations on first access instead of when the spec is loaded
+        self.lazy = lazy
 
     @property
     def operations(self):
+        # materialize every operation not accessed yet in lazy mode
+        for op_id in self._operation_index:
+            if op_id not in self._operations:
+                self._materialize_operation(op_id)
         return self._operations
 
+    async def close(self):
+        """Closes the connections of the requestors, call it when the app shuts down."""
+        await self._async_requestor.close()
+        close = getattr(self._requestor, "close", None)
+        if close is not None:
+            close()
+
+    def has_operation(self, op_id: str) -> bool:
+        # checks the spec without materializing the operation
+        return op_id in self.__dict__.get("_operation_index", {})
+
     @property
     def spec(self):
         return self._spec
@@ -186,7 +508,33 @@ class OpenAPIClient:
         if not isinstance(r, Requestor):
             raise ValueError("requestor should be an instance of Requestor")
         self._requestor = r
-        self._collect_operations()
+        self._rebind_operations()
+
+    @property
+    def async_requestor(self):
+        return self._async_requestor
+
+    def set_async_requestor(self, r: AsyncRequestor):
+        if not isinstance(r, AsyncRequestor):
+            raise ValueError("async requestor should be an instance of AsyncRequestor")
+        self._async_requestor = r
+        self._rebind_operations()
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def set_cache(self, c: typing.Optional[ResponseCache]):
+        self._cache = c
+        self._rebind_operations()
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    def set_scheduler(self, s: typing.Optional[RequestScheduler]):
+        self._scheduler = s
+        self._rebind_operations()
 
     @property
     def server(self):
@@ -194,11 +542,18 @@ class OpenAPIClient:
 
     def set_server(self, s: Server):
         self._server = s
-        self._collect_operations()
+        self._rebind_operations()
 
     def load_spec(self, raw_spec: typing.Dict):
+        self._set_spec(raw_spec, openapi.parse_obj(raw_spec))
+
+    def _set_spec(self, raw_spec: typing.Dict, spec: openapi.OpenAPI, derefered_raw_spec=None):
         self._raw_spec = raw_spec
-        self._spec = openapi.parse_obj(raw_spec)
+        self._spec = spec
+        # reset the cached_property, or seed it with an already dereferenced spec
+        self.__dict__.pop("derefered_raw_spec", None)
+        if derefered_raw_spec is not None:
+            self.__dict__["derefered_raw_spec"] = derefered_raw_spec
 
         # collect server
         self.servers = [Server.from_openapi_server(s) for s in self.spec.servers]
@@ -225,7 +580,7 @@ class OpenAPIClient:
     def _check_derefer_params(
         self,
         params: list[typing.Union[openapi.Parameter, openapi.Reference]],
-        derefered_params_spec: list[dict],
+        *keys: str,
     ) -> list[openapi.Parameter]:
         refs = list(
             filter(
@@ -236,63 +591,107 @@ class OpenAPIClient:
         )
         if not refs:
             return params
-        return [openapi.Parameter(**d) for d in derefered_params_spec]
+        # only dig into the dereferenced spec when the parameters actually hold references
+        derefered_params_spec = self.derefered_raw_spec.get(OPENAPI_KEY_PATHS, {})
+        for key in keys:
+            derefered_params_spec = derefered_params_spec.get(key, {})
+        return [
+            openapi.Parameter(**d)
+            for d in derefered_params_spec.get(OPENAPI_KEY_PARAMETERS, [])
+        ]
 
     def _collect_operations(self):
         if not self.server:
             raise ValueError("server is required, 'set_server' first")
 
-        self._operations = {}
+        # operation id -> [(path, method)], operations are built from it on first access in lazy mode
+        self._operation_index = {}
         for path, path_spec in (self.spec.paths or {}).items():
             for method in self.PATH_ITEM_METHODS:
                 op_spec = getattr(path_spec, method, None)
                 if not op_spec:
                     continue
-                op_id = op_spec.operationId
-                parent_params = self._check_derefer_params(
-                    path_spec.parameters or [],
-                    self.derefered_raw_spec.get(OPENAPI_KEY_PATHS, {})
-                    .get(path, {})
-                    .get(OPENAPI_KEY_PARAMETERS, []),
+                self._operation_index.setdefault(op_spec.operationId, []).append(
+                    (path, method)
                 )
-                op_spec.parameters = self._check_derefer_params(
-                    op_spec.parameters or [],
-                    self.derefered_raw_spec.get(OPENAPI_KEY_PATHS, {})
-                    .get(path, {})
-                    .get(method, {})
-                    .get(OPENAPI_KEY_PARAMETERS, []),
+
+        self._operations = {}
+        if not self.lazy:
+            for op_id in self._operation_index:
+                self._materialize_operation(op_id)
+
+    def _materialize_operation(self, op_id: str):
+        for path, method in self._operation_index[op_id]:
+            path_spec = self.spec.paths[path]
+            op_spec = getattr(path_spec, method)
+            parent_params = self._check_derefer_params(path_spec.parameters or [], path)
+            op_spec.parameters = self._check_derefer_params(
+                op_spec.parameters or [], path, method
+            )
+            op = Operation(
+                path,
+                method,
+                op_spec,
+                requestor=self.requestor,
+                async_requestor=self.async_requestor,
+                cache=self.cache,
+                scheduler=self.scheduler,
+                req_opts=self.req_opts,
+                server=self.server,
+                parent_params=parent_params,
+            )
+            if op_id not in self._operations:
+                self._operations[op_id] = op
+            else:
+                log.warning(
+                    f"multiple '{op_id}' found , operation ID should be unique"
                 )
-                op = Operation(
-                    path,
-                    method,
-                    op_spec,
+                v = self._operations[op_id]
+                if not isinstance(v, list):
+                    self._operations[op_id] = [v]
+                self._operations[op_id].append(op)
+        return self._operations[op_id]
+
+    def _rebind_operations(self):
+        if "_spec" in self.__dict__ and "_operation_index" not in self.__dict__:
+            # the spec was loaded before a server was available
+            self._collect_operations()
+            return
+        for v in self.__dict__.get("_operations", {}).values():
+            for op in v if isinstance(v, list) else [v]:
+                op.rebind(
                     requestor=self.requestor,
-                    req_opts=self.req_opts,
+                    async_requestor=self.async_requestor,
+                    cache=self.cache,
+                    scheduler=self.scheduler,
                     server=self.server,
-                    parent_params=parent_params,
                 )
-                if op_id not in self._operations:
-                    self._operations[op_id] = op
-                else:
-                    log.warning(
-                        f"multiple '{op_id}' found , operation ID should be unique"
-                    )
-                    v = self._operations[op_id]
-                    if not isinstance(v, list):
-                        self._operations[op_id] = [v]
-                    self._operations[op_id].append(op)
 
     def load_spec_from_url(self, url):
         spec = load_spec_from_url(url)
         self.load_spec(spec)
         return self
 
-    def load_spec_from_file(self, file_path):
-        spec = load_spec_from_file(file_path)
-        self.load_spec(spec)
+    def load_spec_from_file(self, file_path, use_snapshot=True):
+        if not use_snapshot:
+            spec = load_spec_from_file(file_path)
+            self.load_spec(spec)
+            return self
+        self._set_spec(*spec_snapshot.load_or_build(file_path, self._build_spec_snapshot))
         return self
 
+    @staticmethod
+    def _build_spec_snapshot(content: bytes):
+        raw_spec = yaml.load(content, Loader=yaml_loader)
+        spec = openapi.parse_obj(raw_spec)
+        derefered_raw_spec = jsonref.replace_refs(raw_spec, proxies=False, lazy_load=False)
+        return raw_spec, spec, derefered_raw_spec
+
     def __getattr__(self, op_name):
-        if op_name in self._operations:
-            return self._operations[op_name]
+        # read through __dict__ so a client without a loaded spec does not recurse here
+        operations = self.__dict__.get("_operations", {})
+        if op_name in operations:
+            return operations[op_name]
+        if op_name in self.__dict__.get("_operation_index", {}):
+            return self._materialize_operation(op_name)
         raise AttributeError(f"'{self.__class__}' has no attribute '{op_name}'")
\ No newline at end of file
@@ -0,0 +1,212 @@
+import re
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+CACHEABLE_METHODS = ("get", "head")
+
+# max-age only: s-maxage applies to shared caches, not to this private one
+_MAX_AGE_PATTERN = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)")
+
+
+def _freeze(value) -> typing.Hashable:
+    # normalizes request params into a hashable form independent of dict ordering
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (str, bytes, int, float)):
+        return value
+    return str(value)
+
+
+class CacheEntry(object):
+    def __init__(self, response, expires_at: float, etag=None, last_modified=None, must_revalidate=False):
+        self.response = response
+        self.expires_at = expires_at
+        self.etag = etag
+        self.last_modified = last_modified
+        self.must_revalidate = must_revalidate
+        content = getattr(response, "content", None)
+        # streamed responses are sized by the bytes they read
+        self.size = len(content) if content is not None else getattr(response, "bytes_read", 0)
+
+    @property
+    def fresh(self):
+        return not self.must_revalidate and time.monotonic() < self.expires_at
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """
+    An in-memory LRU + TTL cache for responses of idempotent operations.
+
+    Entries are bounded both by count and by the total size of the cached bodies.
+    `Cache-Control` response headers are honored (`no-store`, `no-cache`, `max-age`),
+    and expired entries carrying an `ETag` or `Last-Modified` validator are
+    revalidated with a conditional request instead of being dropped.
+
+    Operations can opt in or out from the spec with the `x-cache` extension:
+    `x-cache: false` disables caching, `x-cache: true` enables it and
+    `x-cache: {ttl: 30}` enables it with a specific default TTL in seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 16 * 1024 * 1024,
+        default_ttl: float = 60,
+        cache_by_default: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.cache_by_default = cache_by_default
+        self._entries: "OrderedDict[typing.Hashable, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def policy(self, method: str, spec_extension) -> typing.Optional[float]:
+        """Returns the default TTL for an operation, or None when it should not be cached."""
+        if method.lower() not in CACHEABLE_METHODS:
+            return None
+        if spec_extension is None:
+            return self.default_ttl if self.cache_by_default else None
+        if isinstance(spec_extension, dict):
+            if not spec_extension.get("enabled", True):
+                return None
+            return float(spec_extension.get("ttl", self.default_ttl))
+        return self.default_ttl if spec_extension else None
+
+    @staticmethod
+    def make_key(operation_id: str, method: str, url: str, kwargs: dict) -> typing.Hashable:
+        headers = kwargs.get("headers")
+        return (
+            operation_id,
+            method.lower(),
+            url,
+            _freeze(kwargs.get("params")),
+            _freeze({k.lower(): v for k, v in headers.items()} if headers else None),
+            _freeze(kwargs.get("cookies")),
+            _freeze(kwargs.get("json")),
+            _freeze(kwargs.get("data")),
+        )
+
+    def get(self, key) -> typing.Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            elif not (entry.etag or entry.last_modified):
+                self._remove(key)
+                self.misses += 1
+                return None
+            return entry
+
+    def update(self, key, response, entry: typing.Optional[CacheEntry], ttl: float):
+        """
+        Records the upstream response for `key` and returns the response to hand to the caller:
+        the cached one when the upstream answered 304 Not Modified, otherwise `response` itself.
+        """
+        status_code = response.status_code
+        if status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidations += 1
+                self.hits += 1
+                self._refresh(entry, response.headers, ttl)
+            return entry.response
+        with self._lock:
+            if entry is not None:
+                self.misses += 1
+            if status_code == 200:
+                self._store(key, response, ttl)
+            else:
+                self._remove(key)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _refresh(self, entry: CacheEntry, headers, ttl: float):
+        directives = self._parse_cache_control(headers)
+        if directives is not None:
+            ttl, entry.must_revalidate = directives
+        entry.expires_at = time.monotonic() + ttl
+        entry.etag = headers.get("ETag") or entry.etag
+        entry.last_modified = headers.get("Last-Modified") or entry.last_modified
+
+    def _store(self, key, response, ttl: float):
+        self._remove(key)
+        if "no-store" in (response.headers.get("Cache-Control") or "").lower():
+            return
+        directives = self._parse_cache_control(response.headers)
+        must_revalidate = False
+        if directives is not None:
+            ttl, must_revalidate = directives
+        entry = CacheEntry(
+            response,
+            time.monotonic() + ttl,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            must_revalidate=must_revalidate,
+        )
+        if ttl <= 0 and not (entry.etag or entry.last_modified):
+            return
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    @staticmethod
+    def _parse_cache_control(headers) -> typing.Optional[tuple[float, bool]]:
+        # returns (ttl, must_revalidate), or None when the response does not specify one
+        cache_control = (headers.get("Cache-Control") or "").lower()
+        if not cache_control:
+            return None
+        must_revalidate = "no-cache" in cache_control
+        match = _MAX_AGE_PATTERN.search(cache_control)
+        if match:
+            return (float(match.group(1)), must_revalidate)
+        return (0, True) if must_revalidate else None
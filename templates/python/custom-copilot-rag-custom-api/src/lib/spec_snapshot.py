@@ -0,0 +1,117 @@
+import functools
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import time
+import typing
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".snapshot"
+# bump when the layout of the snapshot data changes
+SNAPSHOT_FORMAT = 2
+# the JSON header line is never longer than this
+_MAX_HEADER_SIZE = 1024
+# packages whose classes are pickled in the snapshot, it is rebuilt when one of their versions changes
+_PICKLED_PACKAGES = ("pydantic", "openapi-pydantic")
+
+T = typing.TypeVar("T")
+
+
+def snapshot_path(spec_path: str) -> str:
+    return spec_path + SNAPSHOT_SUFFIX
+
+
+def load_or_build(spec_path: str, build: typing.Callable[[bytes], T]) -> T:
+    """
+    Returns the snapshot stored next to `spec_path` when it was built from the same spec content,
+    otherwise runs `build` on the spec content and stores its result as the new snapshot.
+
+    The snapshot is keyed by the SHA-256 of the spec file, so editing the spec rebuilds it on the
+    next load, as does a new version of Python, pydantic or openapi-pydantic. It starts with a JSON
+    header line holding the format, those versions, the spec digest and the digest of the pickled
+    data that follows, which is only unpickled once the header and both digests match. This rejects
+    stale and corrupted snapshots, not forged ones: only load specs from locations you trust to write code.
+    """
+    start = time.perf_counter()
+    with open(spec_path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    path = snapshot_path(spec_path)
+
+    data = _read(path, digest)
+    if data is not None:
+        log.info(
+            f"loaded spec snapshot of '{spec_path}' in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return data
+
+    data = build(content)
+    elapsed = time.perf_counter() - start
+    _write(path, digest, data)
+    log.info(f"parsed spec '{spec_path}' and rebuilt its snapshot in {elapsed * 1000:.1f} ms")
+    return data
+
+
+def _read(path: str, digest: str):
+    try:
+        with open(path, "rb") as f:
+            # the header is plain JSON, checked before anything is unpickled
+            header = json.loads(f.readline(_MAX_HEADER_SIZE))
+            if (
+                header.get("format") != SNAPSHOT_FORMAT
+                or header.get("versions") != _versions()
+                or header.get("spec_sha256") != digest
+            ):
+                return None
+            body = f.read()
+        if hashlib.sha256(body).hexdigest() != header.get("data_sha256"):
+            log.warning(f"ignoring corrupted spec snapshot '{path}'")
+            return None
+        return pickle.loads(body)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning(f"ignoring unreadable spec snapshot '{path}': {e}")
+        return None
+
+
+def _write(path: str, digest: str, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        body = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "versions": _versions(),
+            "spec_sha256": digest,
+            "data_sha256": hashlib.sha256(body).hexdigest(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            os.chmod(tmp_path, 0o644)
+            with os.fdopen(fd, "wb") as f:
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                f.write(body)
+            # atomic so concurrent workers never read a partially written snapshot
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        log.warning(f"failed to write spec snapshot '{path}': {e}")
+
+
+@functools.lru_cache(maxsize=None)
+def _versions() -> dict:
+    versions = {"python": "%d.%d" % sys.version_info[:2]}
+    for package in _PICKLED_PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
@@ -45,6 +45,17 @@ This app template also demonstrates usage of techniques like:
 
 ![alt text](https://github.com/OfficeDev/TeamsFx/assets/109947924/d4f9b455-dbb0-4e14-8557-59f9be5c1200)
 
+### Search by embeddings
+By default the local data is ranked by text search only. To also rank it by meaning, add `numpy` to `src/requirements.txt` and set the embeddings model in the `.env` file, and in the app settings of the deployed app:
+{{#useAzureOpenAI}}
+- `AZURE_OPENAI_EMBEDDING_DEPLOYMENT`: the name of an embeddings deployment of your Azure OpenAI resource, such as `text-embedding-ada-002`.
+{{/useAzureOpenAI}}
+{{#useOpenAI}}
+- `OPENAI_EMBEDDING_MODEL`: an OpenAI embeddings model, such as `text-embedding-ada-002`.
+{{/useOpenAI}}
+
+`src/bot.py` then uses `MyVectorDataSource`. The documents are embedded in the background from the first question, which is answered with text search until they are, and the vectors are saved in the temp folder so only new or changed documents are embedded after a restart.
+
 ## What's included in the template
 
 | Folder       | Contents                                            |
@@ -63,6 +74,7 @@ The following files can be customized and demonstrate an example implementation
 |`src/config.py`| Defines the environment variables.|
 |`src/app.py`| Main module of the Basic RAG Bot, hosts a aiohttp api server for the app.|
 |`src/my_data_source.py`| Handles local customized text data search logics.|
+|`src/my_vector_data_source.py`| An optional data source ranking the local data by embeddings similarity combined with text search, see [Search by embeddings](#search-by-embeddings).|
 |`src/data/*.md`| Raw text data source.|
 |`src/prompts/chat/skprompt.txt`| Defines the prompt.|
 |`src/prompts/chat/config.json`| Configures the prompt.|
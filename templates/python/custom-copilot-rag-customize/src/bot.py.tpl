@@ -3,11 +3,13 @@ import sys
 import traceback
 import json
 from dataclasses import asdict
-from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.core import TurnContext
 from teams import Application, ApplicationOptions, TeamsAdapter
 from teams.ai import AIOptions
+from teams.ai.embeddings import AzureOpenAIEmbeddings, AzureOpenAIEmbeddingsOptions, EmbeddingsModel, OpenAIEmbeddings, OpenAIEmbeddingsOptions
 from teams.ai.models import AzureOpenAIModelOptions, OpenAIModel, OpenAIModelOptions
 from teams.ai.planners import ActionPlanner, ActionPlannerOptions
+from teams.ai.tokenizers import GPTTokenizer
 from teams.ai.prompts import PromptManager, PromptManagerOptions
 from teams.state import TurnState
 from teams.feedback_loop_data import FeedbackLoopData
@@ -15,6 +17,7 @@ from teams.feedback_loop_data import FeedbackLoopData
 from my_data_source import MyDataSource
 
 from config import Config
+from sqlite_storage import SqliteStorage
 
 config = Config()
 
@@ -41,15 +44,42 @@ model = OpenAIModel(
     
 prompts = PromptManager(PromptManagerOptions(prompts_folder=f"{os.getcwd()}/prompts"))
 
-my_data_source = MyDataSource('local-search')
+# The data source tokenizes its documents once, with the tokenizer of the planner
+tokenizer = GPTTokenizer()
+embeddings: EmbeddingsModel = None
+{{#useAzureOpenAI}}
+if config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT:
+    embeddings = AzureOpenAIEmbeddings(
+        AzureOpenAIEmbeddingsOptions(
+            azure_api_key=config.AZURE_OPENAI_API_KEY,
+            azure_endpoint=config.AZURE_OPENAI_ENDPOINT,
+            azure_deployment=config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+        )
+    )
+{{/useAzureOpenAI}}
+{{#useOpenAI}}
+if config.OPENAI_EMBEDDING_MODEL:
+    embeddings = OpenAIEmbeddings(
+        OpenAIEmbeddingsOptions(
+            api_key=config.OPENAI_API_KEY,
+            model=config.OPENAI_EMBEDDING_MODEL,
+        )
+    )
+{{/useOpenAI}}
+if embeddings is not None:
+    # ranks the chunks by meaning as well as by words, it needs numpy in requirements.txt
+    from my_vector_data_source import MyVectorDataSource
+    my_data_source = MyVectorDataSource('local-search', embeddings, tokenizer)
+else:
+    my_data_source = MyDataSource('local-search', tokenizer)
 prompts.add_data_source(my_data_source)
 
 planner = ActionPlanner(
-    ActionPlannerOptions(model=model, prompts=prompts, default_prompt="chat")
+    ActionPlannerOptions(model=model, prompts=prompts, default_prompt="chat", tokenizer=tokenizer)
 )
 
 # Define storage and application
-storage = MemoryStorage()
+storage = SqliteStorage(config.STATE_DB_PATH)
 bot_app = Application[TurnState](
     ApplicationOptions(
         bot_app_id=config.APP_ID,
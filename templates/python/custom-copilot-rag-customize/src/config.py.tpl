@@ -4,6 +4,7 @@ Licensed under the MIT License.
 """
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -15,12 +16,20 @@ class Config:
     PORT = 3978
     APP_ID = os.environ.get("BOT_ID", "")
     APP_PASSWORD = os.environ.get("BOT_PASSWORD", "")
+    # SQLite database storing the bot state. It must be on a local disk, not on a network share such as
+    # /home on Azure App Service. The default in the temp folder suits local debugging only: App Service
+    # wipes it when the app restarts, so conversations lose their state. In production, set STATE_DB_PATH
+    # to a file on a local disk that persists across restarts, or replace SqliteStorage with a shared
+    # storage such as Azure Blob Storage, which is also needed to run several instances.
+    STATE_DB_PATH = os.environ.get("STATE_DB_PATH", os.path.join(tempfile.gettempdir(), "bot-state", "state.db"))
     {{#useAzureOpenAI}}
     AZURE_OPENAI_API_KEY = os.environ["AZURE_OPENAI_API_KEY"] # Azure OpenAI API key
     AZURE_OPENAI_MODEL_DEPLOYMENT_NAME = os.environ["AZURE_OPENAI_MODEL_DEPLOYMENT_NAME"] # Azure OpenAI model deployment name
     AZURE_OPENAI_ENDPOINT = os.environ["AZURE_OPENAI_ENDPOINT"] # Azure OpenAI endpoint
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.environ.get("AZURE_OPENAI_EMBEDDING_DEPLOYMENT") # Optional, Azure OpenAI embeddings deployment for vector search
     {{/useAzureOpenAI}}
     {{#useOpenAI}}
     OPENAI_API_KEY = os.environ["OPENAI_API_KEY"] # OpenAI API key
     OPENAI_MODEL_NAME='gpt-3.5-turbo' # OpenAI model name. You can use any other model name from OpenAI.
+    OPENAI_EMBEDDING_MODEL = os.environ.get("OPENAI_EMBEDDING_MODEL") # Optional, OpenAI embeddings model for vector search
     {{/useOpenAI}}
\ No newline at end of file
@@ -0,0 +1,76 @@
+import mmap
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+@dataclass
+class CorpusChanges:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+class Corpus:
+    """
+    The documents of a directory, read on demand through memory maps.
+
+    No document text is kept in memory: reads map the file and decode the requested
+    range, so the pages are shared through the OS page cache by every worker process
+    and no file stays open. The directory is rescanned at most every `check_interval`
+    seconds to report the files added, changed (by modification time or size) and removed.
+    """
+
+    def __init__(self, directory: str, check_interval: float = 2.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._checked_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, name: str):
+        return name in self._files
+
+    def names(self) -> List[str]:
+        return sorted(self._files)
+
+    def read(self, name: str, start: int = 0, end: Optional[int] = None, errors: str = 'strict') -> str:
+        """Returns the text of the document between the byte offsets `start` and `end`."""
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ''
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return data[start:end].decode('utf-8', errors)
+
+    def poll(self) -> CorpusChanges:
+        """Returns the changes since the last scan, without scanning before `check_interval` elapsed."""
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return CorpusChanges()
+        return self.scan()
+
+    def scan(self) -> CorpusChanges:
+        self._checked_at = time.monotonic()
+        changes = CorpusChanges()
+        files = {}
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+
+        for name in sorted(files):
+            if name not in self._files:
+                changes.added.append(name)
+            elif self._files[name] != files[name]:
+                changes.changed.append(name)
+        changes.removed = sorted(self._files.keys() - files.keys())
+        self._files = files
+        return changes
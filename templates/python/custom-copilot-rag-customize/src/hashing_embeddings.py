@@ -0,0 +1,33 @@
+import hashlib
+from typing import List, Union
+
+from teams.ai.embeddings import EmbeddingsModel, EmbeddingsResponse
+
+from search_index import tokenize
+
+class HashingEmbeddings(EmbeddingsModel):
+    """
+    Deterministic embeddings computed locally by hashing the words of the text into
+    `dimensions` buckets. They only capture word overlap, not meaning: use them to run
+    the vector data source offline, and an embeddings model such as `OpenAIEmbeddings` otherwise.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    async def create_embeddings(
+        self, inputs: Union[str, List[str], List[int], List[List[int]]]
+    ) -> EmbeddingsResponse:
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        if not all(isinstance(text, str) for text in texts):
+            return EmbeddingsResponse(status="error", message="only text inputs are supported")
+        return EmbeddingsResponse(status="success", output=[self._embed(text) for text in texts])
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for term in tokenize(text):
+            digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # a hashed sign keeps words colliding in a bucket from always adding up
+            vector[value % self.dimensions] += 1.0 if (value >> 63) else -1.0
+        return vector
@@ -1,36 +1,172 @@
+import asyncio
 import os
 from dataclasses import dataclass
+from typing import List, Optional, Tuple
 
 from teams.ai.tokenizers import Tokenizer
 from teams.ai.data_sources import DataSource
 from teams.state.state import TurnContext
 from teams.state.memory import Memory
 
+from corpus import Corpus, CorpusChanges
+from search_index import BM25Index
+
+CHUNK_SEPARATOR = "\n\n"
+
 @dataclass
 class Result:
     output: str
     length: int
     too_long: bool
 
+@dataclass
+class Chunk:
+    file: str
+    # byte offsets of the chunk in its file
+    start: int
+    end: int
+    length: Optional[int] = None
+
+def split_into_chunks(text: str, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Splits text into chunks of about `chunk_size` characters, on paragraph boundaries when possible.
+    Returns the start and end offsets of the chunks in the text.
+    """
+    spans = []
+    start = end = None
+    position = 0
+    for paragraph in text.split(CHUNK_SEPARATOR):
+        paragraph_start, paragraph_end = position, position + len(paragraph)
+        position = paragraph_end + len(CHUNK_SEPARATOR)
+        if not paragraph.strip():
+            continue
+        if start is not None and paragraph_end - start > chunk_size:
+            spans.append((start, end))
+            start = None
+        if start is None:
+            start = paragraph_start
+        end = paragraph_end
+        # paragraphs longer than a chunk are cut
+        while end - start > chunk_size:
+            spans.append((start, start + chunk_size))
+            start += chunk_size
+    if start is not None:
+        spans.append((start, end))
+    return spans
+
+def to_byte_offsets(text: str, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # spans are in order, so the text is encoded once overall
+    offsets = []
+    position = byte_position = 0
+    for start, end in spans:
+        byte_start = byte_position + len(text[position:start].encode('utf-8'))
+        byte_position = byte_start + len(text[start:end].encode('utf-8'))
+        position = end
+        offsets.append((byte_start, byte_position))
+    return offsets
+
 class MyDataSource(DataSource):
     """
     A data source that searches through a local directory of files for a given query.
+    The files are split into chunks indexed once when the data source is created, and
+    the best ranked chunks (BM25) are packed into the token budget of the data source.
+    Only the index and the chunk offsets are kept in memory, chunk text is read from the
+    memory-mapped files when rendered. Files added, changed or removed in the directory
+    are reindexed on the next render.
     """
 
-    def __init__(self, name):
+    # number of best matching chunks considered for the prompt
+    top_k = 10
+    # size of the chunks the files are split into, in characters
+    chunk_size = 1000
+
+    def __init__(self, name, tokenizer: Optional[Tokenizer] = None):
         """
         Creates a new instance of the LocalDataSource instance.
         Initializes the data source.
+        Pass the tokenizer of the planner to tokenize the chunks now instead of on first use.
         """
         self.name = name
-        
+
         filePath = os.path.join(os.path.dirname(__file__), 'data')
-        files = os.listdir(filePath)
-        self._data = [open(os.path.join(filePath, file), 'r').read() for file in files]
-        
+        self._corpus = Corpus(filePath)
+        self._chunks = {}
+        self._file_chunks = {}
+        self._index = BM25Index()
+        self._tokenizer = tokenizer
+        self._polling = False
+        if tokenizer is not None:
+            self._separator_length = len(tokenizer.encode(CHUNK_SEPARATOR))
+            self._wrapper_length = len(tokenizer.encode(self.formatDocument('')))
+        self._update(self._corpus.scan())
+
     def name(self):
         return self.name
 
+    def _update(self, changes: CorpusChanges):
+        for file in changes.changed + changes.removed:
+            for chunk_id in self._file_chunks.pop(file, []):
+                self._index.remove(chunk_id)
+                del self._chunks[chunk_id]
+                self._chunk_removed(chunk_id)
+
+        for file in changes.added + changes.changed:
+            try:
+                text = self._corpus.read(file)
+            except (OSError, UnicodeDecodeError):
+                # removed since the scan or not a text file, left out of the index
+                continue
+            spans = split_into_chunks(text, self.chunk_size)
+            chunk_ids = []
+            for i, ((start, end), (byte_start, byte_end)) in enumerate(zip(spans, to_byte_offsets(text, spans))):
+                chunk_id = f"{file}#{i}"
+                chunk_text = text[start:end]
+                length = len(self._tokenizer.encode(chunk_text)) if self._tokenizer else None
+                self._chunks[chunk_id] = Chunk(file, byte_start, byte_end, length)
+                self._index.add(chunk_id, chunk_text)
+                self._chunk_added(chunk_id, chunk_text)
+                chunk_ids.append(chunk_id)
+            self._file_chunks[file] = chunk_ids
+
+    def _chunk_added(self, chunk_id: str, text: str):
+        """Called for each chunk indexed, for subclasses keeping their own index of the chunks."""
+
+    def _chunk_removed(self, chunk_id: str):
+        """Called for each chunk removed from the index."""
+
+    async def _search(self, query: str) -> List[str]:
+        """Returns the ids of the chunks matching the query, best first."""
+        return [chunk_id for chunk_id, _score in self._index.search(query, self.top_k)]
+
+    def _read_chunk(self, chunk: Chunk) -> str:
+        # the file may have changed since it was indexed, it is reindexed on the next scan
+        try:
+            return self._corpus.read(chunk.file, chunk.start, chunk.end, errors='replace')
+        except OSError:
+            return ''
+
+    async def _poll(self):
+        # the directory is listed in a worker thread, a single poll runs at a time
+        if self._polling:
+            return
+        self._polling = True
+        try:
+            changes = await asyncio.get_running_loop().run_in_executor(None, self._corpus.poll)
+        finally:
+            self._polling = False
+        self._update(changes)
+
+    def _tokenize(self, tokenizer: Tokenizer):
+        # token counts only change with the tokenizer, so chunks are encoded again for another
+        # tokenizer instance: two instances of a class may use different encodings
+        if tokenizer is self._tokenizer:
+            return
+        self._tokenizer = tokenizer
+        for chunk in self._chunks.values():
+            chunk.length = len(tokenizer.encode(self._read_chunk(chunk)))
+        self._separator_length = len(tokenizer.encode(CHUNK_SEPARATOR))
+        self._wrapper_length = len(tokenizer.encode(self.formatDocument('')))
+
     async def render_data(self, context: TurnContext, memory: Memory, tokenizer: Tokenizer, maxTokens: int):
         """
         Renders the data source as a string of text.
@@ -39,24 +175,33 @@ class MyDataSource(DataSource):
         query = memory.get('temp.input')
         if not query:
             return Result('', 0, False)
-        
-        result=''
-        # Text search
-        for data in self._data:
-            if query in data:
-                result += data
-        # Key word search
-        if 'history' in query.lower() or 'company' in query.lower():
-            result += self._data[0]
-        if 'perksplus' in query.lower() or 'program' in query.lower():
-            result += self._data[1]
-        if 'northwind' in query.lower() or 'health' in query.lower():
-            result += self._data[2]
-       
-        return Result(self.formatDocument(result), len(result), False) if result!='' else Result('', 0, False)
+        await self._poll()
+        self._tokenize(tokenizer)
+
+        # best ranked chunks first, skipping the ones that no longer fit
+        budget = maxTokens - self._wrapper_length
+        parts = []
+        length = 0
+        too_long = False
+        for chunk_id in await self._search(query):
+            chunk = self._chunks[chunk_id]
+            size = chunk.length + (self._separator_length if parts else 0)
+            if length + size <= budget:
+                parts.append(self._read_chunk(chunk))
+                length += size
+                continue
+            too_long = True
+            if not parts and budget > 0:
+                # the best chunk alone is over budget, keep as much of it as fits
+                parts.append(tokenizer.decode(tokenizer.encode(self._read_chunk(chunk))[:budget]))
+                length = budget
+
+        if not parts:
+            return Result('', 0, too_long)
+        return Result(self.formatDocument(CHUNK_SEPARATOR.join(parts)), length + self._wrapper_length, too_long)
 
     def formatDocument(self, result):
         """
         Formats the result string 
         """
-        return f"<context>{result}</context>"
\ No newline at end of file
+        return f"<context>{result}</context>"
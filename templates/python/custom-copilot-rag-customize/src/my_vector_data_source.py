@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import itertools
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional, Set
+
+from teams.ai.embeddings import EmbeddingsModel
+from teams.ai.tokenizers import Tokenizer
+
+from my_data_source import MyDataSource
+from vector_index import VectorIndex
+
+class MyVectorDataSource(MyDataSource):
+    """
+    A data source searching the local directory of files by meaning as well as by words.
+
+    The chunks of `MyDataSource` are embedded with `embeddings` into a local `VectorIndex`,
+    saved on the local disk so only new or changed chunks are embedded after a restart.
+    Chunks are embedded in the background, starting with the first question: until they
+    are, the turns are answered with the text search only.
+    Chunks are ranked by a hybrid score: the cosine similarity of the chunk to the query
+    combined with its BM25 score normalized by the best one. Once the corpus reaches
+    `approximate_threshold` chunks, the vector index switches to approximate (IVF) search.
+
+    It needs numpy, which is not installed by default: `bot.py` uses it when an embeddings
+    model is configured, see the README.
+    """
+
+    # weight of the cosine similarity in the hybrid score, the rest is the normalized BM25 score
+    vector_weight = 0.5
+    # number of chunks from which the approximate index is built
+    approximate_threshold = 20000
+    # number of chunks embedded per embeddings request
+    embedding_batch_size = 64
+
+    def __init__(self, name, embeddings: EmbeddingsModel, tokenizer: Optional[Tokenizer] = None, index_path: Optional[str] = None):
+        """
+        Creates a new instance of the data source, embedding chunks with `embeddings`.
+        Chunks are embedded in the background from the first render, await `sync_vectors` to embed them ahead.
+        The index is saved to `index_path`, by default in the temp folder: it must be on a local disk,
+        not on a network share such as /home on Azure App Service, and is rebuilt when it is lost.
+        """
+        self._embeddings = embeddings
+        self._index_path = index_path or os.path.join(tempfile.gettempdir(), 'bot-vectors', name)
+        self._vectors = VectorIndex.load(self._index_path)
+        # chunks with the same text share their vector, keyed by the hash of the text
+        self._content_ids: Dict[str, str] = {}
+        self._content_chunks: Dict[str, Set[str]] = {}
+        self._pending: Dict[str, str] = {}
+        self._has_stale_vectors = self._vectors is not None
+        self._sync_task: Optional[asyncio.Task] = None
+        super().__init__(name, tokenizer)
+
+    def _chunk_added(self, chunk_id: str, text: str):
+        content_id = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self._content_ids[chunk_id] = content_id
+        self._content_chunks.setdefault(content_id, set()).add(chunk_id)
+        if self._vectors is None or content_id not in self._vectors:
+            self._pending[content_id] = text
+
+    def _chunk_removed(self, chunk_id: str):
+        content_id = self._content_ids.pop(chunk_id)
+        chunk_ids = self._content_chunks[content_id]
+        chunk_ids.discard(chunk_id)
+        if not chunk_ids:
+            del self._content_chunks[content_id]
+            self._pending.pop(content_id, None)
+            self._has_stale_vectors = True
+
+    async def sync_vectors(self):
+        """Embeds the chunks added since the last sync and drops the vectors of removed chunks."""
+        task = self._start_sync()
+        if task is not None:
+            await asyncio.shield(task)
+
+    def _start_sync(self) -> Optional[asyncio.Task]:
+        # a single sync runs at a time, the turns do not wait for it
+        if self._sync_task is None or self._sync_task.done():
+            if not self._pending and not self._has_stale_vectors:
+                return None
+            self._sync_task = asyncio.ensure_future(self._sync())
+            self._sync_task.add_done_callback(_report_sync_error)
+        return self._sync_task
+
+    async def _sync(self):
+        changed = False
+        if self._has_stale_vectors and self._vectors is not None:
+            self._vectors.remove([id for id in self._vectors.ids if id not in self._content_chunks])
+            self._has_stale_vectors = False
+            changed = True
+
+        while self._pending:
+            batch = list(itertools.islice(self._pending.items(), self.embedding_batch_size))
+            vectors = await self._embed([text for _, text in batch])
+            if vectors is None:
+                # left pending, retried on the next render
+                break
+            if self._vectors is None or self._vectors.dimensions != len(vectors[0]):
+                self._reset_vectors(len(vectors[0]))
+            self._vectors.add([content_id for content_id, _ in batch], vectors)
+            for content_id, _ in batch:
+                self._pending.pop(content_id, None)
+            changed = True
+
+        if changed:
+            if len(self._vectors) >= self.approximate_threshold and not self._vectors.is_approximate:
+                self._vectors.build_approximate()
+            await asyncio.get_running_loop().run_in_executor(None, self._vectors.save, self._index_path)
+
+    def _reset_vectors(self, dimensions: int):
+        # the saved vectors come from another embeddings model, every chunk is embedded again
+        self._vectors = VectorIndex(dimensions)
+        for content_id, chunk_ids in self._content_chunks.items():
+            if content_id not in self._pending:
+                self._pending[content_id] = self._read_chunk(self._chunks[next(iter(chunk_ids))])
+
+    async def _embed(self, texts: List[str]) -> Optional[List[List[float]]]:
+        response = await self._embeddings.create_embeddings(texts)
+        if response.status != "success":
+            print(f"Failed to create embeddings: {response.message or response.output}", file=sys.stderr)
+            return None
+        return response.output
+
+    async def _search(self, query: str) -> List[str]:
+        self._start_sync()
+        lexical = self._index.search(query, self.top_k * 2)
+        query_vector = await self._embed([query]) if self._vectors else None
+        # the saved vectors may come from another embeddings model until they are embedded again
+        if not query_vector or len(query_vector[0]) != self._vectors.dimensions:
+            return [chunk_id for chunk_id, _score in lexical[:self.top_k]]
+
+        scores: Dict[str, float] = {}
+        best_lexical = lexical[0][1] if lexical else 1
+        for chunk_id, score in lexical:
+            scores[chunk_id] = (1 - self.vector_weight) * score / best_lexical
+        for content_id, similarity in self._vectors.search(query_vector[0], self.top_k * 2):
+            if similarity <= 0:
+                continue
+            for chunk_id in self._content_chunks.get(content_id, ()):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + self.vector_weight * similarity
+        return sorted(scores, key=scores.get, reverse=True)[:self.top_k]
+
+def _report_sync_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Failed to embed the local data: {task.exception()}", file=sys.stderr)
@@ -0,0 +1,82 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# words too common to tell documents apart, left out of the index
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this "
+    "to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text into lowercase word terms, without stop words."""
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOP_WORDS]
+
+
+class BM25Index:
+    """
+    An in-memory inverted index ranking documents with Okapi BM25.
+
+    Each term maps to the documents containing it and its frequency in them, so a query
+    only scores the documents sharing a term with it instead of scanning the whole corpus.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, int]] = {}
+        self._doc_lengths: dict[str, int] = {}
+        self._doc_terms: dict[str, tuple[str, ...]] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def __contains__(self, doc_id: str):
+        return doc_id in self._doc_lengths
+
+    def add(self, doc_id: str, text: str):
+        """Indexes the text of a document, replacing its previous text if it was indexed."""
+        if doc_id in self._doc_lengths:
+            self.remove(doc_id)
+        terms = tokenize(text)
+        frequencies = Counter(terms)
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+        self._doc_terms[doc_id] = tuple(frequencies)
+        self._doc_lengths[doc_id] = len(terms)
+        self._total_length += len(terms)
+
+    def remove(self, doc_id: str):
+        length = self._doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(doc_id):
+            docs = self._postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self._postings[term]
+
+    def search(self, query: str, top_k: int = 3) -> list[tuple[str, float]]:
+        """Returns the ids and scores of the `top_k` best matching documents, best first."""
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return []
+        average_length = self._total_length / doc_count or 1
+        k1, b = self.k1, self.b
+
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            docs = self._postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                norm = k1 * (1 - b + b * self._doc_lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
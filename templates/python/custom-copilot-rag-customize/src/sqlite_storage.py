@@ -0,0 +1,247 @@
+"""
+Copyright (c) Microsoft Corporation. All rights reserved.
+Licensed under the MIT License.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from typing import Any, Dict, List, Optional, Tuple
+
+from botbuilder.core import Storage, StoreItem
+from jsonpickle import encode
+from jsonpickle.unpickler import Unpickler
+
+
+class SqliteStorage(Storage):
+    """
+    Stores the bot state in a local SQLite database in WAL mode, so that it survives restarts
+    and is shared by the worker processes of a machine.
+
+    Items are serialized with jsonpickle, like the Azure storages of the Bot Framework SDK, and
+    get an `e_tag` when read. Writing an item whose `e_tag` is not the stored one (or "*") raises
+    a KeyError, as MemoryStorage does, so concurrent turns can't overwrite each other's changes.
+
+    Items read or written recently are kept in an LRU cache, bounded by count and by size.
+    A cached item is used as long as its stored `e_tag` is unchanged, which only costs a lookup
+    of the key, so items written by other processes are never read stale.
+
+    The database is used from a single thread. Writes and deletes are queued, and the ones issued
+    while a transaction is running are committed together in the next one: each call still
+    returns once its changes are committed, with its own result.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache_size: int = 1024,
+        cache_max_bytes: int = 64 * 1024 * 1024,
+        timeout: float = 30,
+    ):
+        super().__init__()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.cache_size = cache_size
+        self.cache_max_bytes = cache_max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage")
+        self._connection = self._executor.submit(self._connect, path, timeout).result()
+        # key: (e_tag, item, size), only used from the database thread
+        self._cache: "OrderedDict[str, Tuple[str, Any, int]]" = OrderedDict()
+        self._cache_bytes = 0
+        self._queue: List[Tuple[str, Any, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Future] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.transactions = 0
+
+    async def read(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        return await self._run(self._read, list(keys))
+
+    async def write(self, changes: Dict[str, Any]):
+        if changes is None:
+            raise Exception("Changes are required when writing")
+        if not changes:
+            return
+        await self._enqueue("write", dict(changes))
+
+    async def delete(self, keys: List[str]):
+        if not keys:
+            return
+        await self._enqueue("delete", list(keys))
+
+    async def close(self):
+        """Commits the queued changes and closes the database."""
+        while self._flush_task is not None:
+            await self._flush_task
+        await self._run(self._connection.close)
+        self._executor.shutdown()
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_entries": len(self._cache),
+            "cache_bytes": self._cache_bytes,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "transactions": self.transactions,
+        }
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _enqueue(self, operation: str, value: Any):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((operation, value, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush())
+        await future
+
+    async def _flush(self):
+        try:
+            while self._queue:
+                operations = self._queue
+                self._queue = []
+                try:
+                    results = await self._run(self._commit, [(op, value) for op, value, _ in operations])
+                except Exception as error:
+                    results = [error] * len(operations)
+                for (_, _, future), result in zip(operations, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(None)
+        finally:
+            self._flush_task = None
+
+    @staticmethod
+    def _connect(path: str, timeout: float) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # in WAL mode, commits survive a crash of the process without waiting for the disk
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, e_tag TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+        return connection
+
+    def _read(self, keys: List[str]) -> Dict[str, Any]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection.execute(
+            f"SELECT key, e_tag, value FROM state WHERE key IN ({placeholders})", keys
+        ).fetchall()
+        items = {}
+        for key, e_tag, value in rows:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == e_tag:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                items[key] = deepcopy(cached[1])
+                continue
+            self.cache_misses += 1
+            item = Unpickler().restore(json.loads(value))
+            _set_e_tag(item, e_tag)
+            self._cache_set(key, e_tag, item, len(value))
+            items[key] = deepcopy(item)
+        return items
+
+    def _commit(self, operations: List[Tuple[str, Any]]) -> List[Optional[Exception]]:
+        """Applies the operations in one transaction, each one entirely or not at all."""
+        # items are serialized before taking the write lock, which is shared with the other processes
+        prepared = []
+        for operation, value in operations:
+            try:
+                prepared.append(self._prepare_write(value) if operation == "write" else None)
+            except Exception as error:
+                prepared.append(error)
+
+        results = []
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            for (operation, value), entries in zip(operations, prepared):
+                if isinstance(entries, Exception):
+                    results.append(entries)
+                    continue
+                self._connection.execute("SAVEPOINT operation")
+                try:
+                    if operation == "write":
+                        self._write(entries)
+                    else:
+                        self._connection.executemany("DELETE FROM state WHERE key = ?", [(key,) for key in value])
+                    self._connection.execute("RELEASE operation")
+                    results.append(None)
+                except Exception as error:
+                    self._connection.execute("ROLLBACK TO operation")
+                    self._connection.execute("RELEASE operation")
+                    results.append(error)
+            self._connection.execute("COMMIT")
+        except BaseException:
+            if self._connection.in_transaction:
+                self._connection.execute("ROLLBACK")
+            raise
+        self.transactions += 1
+
+        for (operation, value), entries, result in zip(operations, prepared, results):
+            if result is not None:
+                continue
+            if operation == "write":
+                for key, _, e_tag, item, encoded in entries:
+                    self._cache_set(key, e_tag, item, len(encoded))
+            else:
+                for key in value:
+                    self._cache_remove(key)
+        return results
+
+    def _prepare_write(self, changes: Dict[str, Any]) -> List[Tuple[str, Optional[str], str, Any, str]]:
+        entries = []
+        for key, change in changes.items():
+            expected_e_tag = change.get("e_tag") if isinstance(change, dict) else getattr(change, "e_tag", None)
+            if expected_e_tag == "":
+                raise Exception("sqlite_storage.write(): etag missing")
+            e_tag = uuid.uuid4().hex
+            item = deepcopy(change)
+            _set_e_tag(item, e_tag)
+            entries.append((key, expected_e_tag, e_tag, item, encode(item)))
+        return entries
+
+    def _write(self, entries: List[Tuple[str, Optional[str], str, Any, str]]):
+        for key, expected_e_tag, e_tag, _, encoded in entries:
+            if expected_e_tag is not None and expected_e_tag != "*":
+                row = self._connection.execute("SELECT e_tag FROM state WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[0] != expected_e_tag:
+                    self._cache_remove(key)
+                    raise KeyError(f"Etag conflict.\nOriginal: {expected_e_tag}\r\nCurrent: {row[0]}")
+            self._connection.execute(
+                "INSERT OR REPLACE INTO state (key, e_tag, value) VALUES (?, ?, ?)", (key, e_tag, encoded)
+            )
+
+    def _cache_set(self, key: str, e_tag: str, item: Any, size: int):
+        self._cache_remove(key)
+        if self.cache_size <= 0 or size > self.cache_max_bytes:
+            return
+        self._cache[key] = (e_tag, item, size)
+        self._cache_bytes += size
+        while len(self._cache) > self.cache_size or self._cache_bytes > self.cache_max_bytes:
+            self._cache_remove(next(iter(self._cache)))
+
+    def _cache_remove(self, key: str):
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cache_bytes -= cached[2]
+
+
+def _set_e_tag(item: Any, e_tag: str):
+    if isinstance(item, dict):
+        item["e_tag"] = e_tag
+    elif isinstance(item, StoreItem) or hasattr(item, "__dict__"):
+        item.e_tag = e_tag
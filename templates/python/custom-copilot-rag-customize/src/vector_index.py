@@ -0,0 +1,206 @@
+import json
+import os
+import tempfile
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+class VectorIndex:
+    """
+    Embeddings kept as the rows of a contiguous float32 matrix, searched by cosine similarity.
+
+    Rows are normalized when added, so a search is one matrix-vector product. The matrix is
+    saved as a `.npy` file and loaded memory-mapped, so worker processes share its pages.
+    Each save writes the matrix to a new file, as a mapped file can't be replaced on Windows.
+    Added rows are copied into a buffer grown geometrically, so adding in batches stays linear.
+    For large corpora `build_approximate` clusters the rows (IVF): a search then only
+    scores the rows of the `n_probe` clusters closest to the query.
+    """
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+        self.ids: List[str] = []
+        self._rows = {}
+        self._matrix = np.empty((0, dimensions), dtype=np.float32)
+        # the rows of `_matrix` and `_assignments` are the first rows of these buffers, None until added to
+        self._matrix_buffer: Optional[np.ndarray] = None
+        self._assignments_buffer: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        # rows of each cluster, grouped again on the first search after rows are added or removed
+        self._lists: Optional[List[np.ndarray]] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, id: str):
+        return id in self._rows
+
+    @property
+    def is_approximate(self):
+        return self._centroids is not None
+
+    def add(self, ids: Sequence[str], vectors):
+        """Adds or replaces the vectors of `ids`."""
+        self.remove([id for id in ids if id in self._rows])
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dimensions))
+        start = len(self.ids)
+        for offset, id in enumerate(ids):
+            self._rows[id] = start + offset
+        self.ids.extend(ids)
+        self._matrix_buffer, self._matrix = _append(self._matrix_buffer, self._matrix, vectors)
+        if self._centroids is not None:
+            # new rows join their closest cluster, the clusters themselves are not recomputed
+            assignments = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+            self._assignments_buffer, self._assignments = _append(
+                self._assignments_buffer, self._assignments, assignments
+            )
+            self._lists = None
+
+    def remove(self, ids: Sequence[str]):
+        rows = [self._rows[id] for id in ids if id in self._rows]
+        if not rows:
+            return
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self._matrix = self._matrix[keep]
+        self._matrix_buffer = None
+        self.ids = [id for id, kept in zip(self.ids, keep) if kept]
+        self._rows = {id: row for row, id in enumerate(self.ids)}
+        if self._centroids is not None:
+            self._assignments = self._assignments[keep]
+            self._assignments_buffer = None
+            self._lists = None
+
+    def build_approximate(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Clusters the rows with spherical k-means, by default into about sqrt(n) clusters."""
+        count = len(self.ids)
+        n_lists = min(n_lists or max(1, int(np.sqrt(count))), count)
+        if n_lists == 0:
+            return
+        rng = np.random.default_rng(seed)
+        # the centroids are trained on a sample, then every row is assigned once
+        sample = self._matrix[rng.choice(count, size=min(count, n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for i in range(n_lists):
+                members = sample[assignments == i]
+                if len(members):
+                    centroids[i] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+        self._centroids = centroids
+        self._assignments = np.concatenate(
+            [np.argmax(block @ centroids.T, axis=1) for block in _blocks(self._matrix)]
+        ).astype(np.int32) if count else np.empty(0, dtype=np.int32)
+        self._assignments_buffer = None
+        self._lists = _group_rows(self._assignments, n_lists)
+
+    def search(self, vector, top_k: int = 10, n_probe: int = 8) -> List[Tuple[str, float]]:
+        """Returns the ids and cosine similarities of the `top_k` closest rows, best first."""
+        if not self.ids or top_k <= 0:
+            return []
+        query = _normalize(np.asarray(vector, dtype=np.float32).reshape(1, self.dimensions))[0]
+        if self._centroids is None:
+            rows = None
+            scores = self._matrix @ query
+        else:
+            if self._lists is None:
+                self._lists = _group_rows(self._assignments, len(self._centroids))
+            probed = np.argsort(-(self._centroids @ query))[:n_probe]
+            rows = np.concatenate([self._lists[i] for i in probed])
+            scores = self._matrix[rows] @ query
+
+        top_k = min(top_k, len(scores))
+        if top_k == 0:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        if rows is not None:
+            return [(self.ids[rows[i]], float(scores[i])) for i in best]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+    def save(self, path: str):
+        """
+        Saves the matrix as `<path>.<version>.npy` and the metadata naming it as `<path>.json`, replaced
+        atomically. Matrix files of previous saves are removed, except those still mapped on Windows.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.basename(path) + "."
+        matrix_file = f"{prefix}{uuid.uuid4().hex}.npy"
+        metadata = {"dimensions": self.dimensions, "ids": self.ids, "matrix": matrix_file}
+        if self._centroids is not None:
+            metadata["centroids"] = self._centroids.tolist()
+            metadata["assignments"] = self._assignments.tolist()
+        _write_atomic(
+            os.path.join(directory, matrix_file), directory, lambda f: np.save(f, np.ascontiguousarray(self._matrix))
+        )
+        _write_atomic(path + ".json", directory, lambda f: f.write(json.dumps(metadata).encode("utf-8")))
+        for entry in os.scandir(directory):
+            if entry.name.startswith(prefix) and entry.name.endswith(".npy") and entry.name != matrix_file:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    @classmethod
+    def load(cls, path: str) -> Optional["VectorIndex"]:
+        """Loads the index saved at `path` with its matrix memory-mapped, None when there is none."""
+        try:
+            with open(path + ".json", "rb") as f:
+                metadata = json.load(f)
+            matrix_file = metadata.get("matrix", os.path.basename(path) + ".npy")
+            matrix = np.load(os.path.join(os.path.dirname(os.path.abspath(path)), matrix_file), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if matrix.shape != (len(metadata["ids"]), metadata["dimensions"]):
+            return None
+        index = cls(metadata["dimensions"])
+        index.ids = metadata["ids"]
+        index._rows = {id: row for row, id in enumerate(index.ids)}
+        index._matrix = matrix
+        if "centroids" in metadata:
+            index._centroids = np.asarray(metadata["centroids"], dtype=np.float32)
+            index._assignments = np.asarray(metadata["assignments"], dtype=np.int32)
+            index._lists = _group_rows(index._assignments, len(index._centroids))
+        return index
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+def _append(buffer: Optional[np.ndarray], used: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Appends `rows` after `used`, the first rows of `buffer`, and returns the buffer and its used rows.
+    The buffer is reallocated at twice the size when full, and first allocated when None.
+    """
+    count = len(used)
+    needed = count + len(rows)
+    if buffer is None or len(buffer) < needed:
+        grown = np.empty((max(needed, 2 * count, 64),) + rows.shape[1:], dtype=rows.dtype)
+        grown[:count] = used
+        buffer = grown
+    buffer[count:needed] = rows
+    return buffer, buffer[:needed]
+
+def _group_rows(assignments: np.ndarray, n_lists: int) -> List[np.ndarray]:
+    order = np.argsort(assignments, kind="stable")
+    bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+
+def _blocks(matrix: np.ndarray, size: int = 65536):
+    for start in range(0, len(matrix), size):
+        yield matrix[start:start + size]
+
+def _write_atomic(path: str, directory: str, write):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,98 @@
+import json
+
+from lib.adaptive_card_renderer import AdaptiveCardRenderer
+
+TEMPLATE = json.dumps({
+    "type": "AdaptiveCard",
+    "version": "1.5",
+    "body": [
+        {"type": "TextBlock", "text": "Repairs for ${owner.name}", "wrap": True},
+        {"type": "Container", "$data": "${items}", "items": [
+            {"type": "TextBlock", "text": "${title} (${ if(status, status, 'unknown') })", "wrap": True},
+            {"type": "TextBlock", "text": "Tags: ${jsonStringify(tags)}"},
+            {"type": "TextBlock", "text": "First tag: ${tags[0]}"},
+            {"type": "Image", "url": "${image}", "$when": "${image != null && image != ''}"},
+        ]},
+        {"type": "Container", "items": [{"type": "TextBlock", "text": "static"}]},
+    ],
+})
+
+DATA = {
+    "owner": {"name": "Karin"},
+    "items": [
+        {"title": "Oil change", "status": "done", "tags": ["car"], "image": "https://example.com/1.png"},
+        {"title": "Tire", "status": None, "tags": ["car", "wheel"], "image": ""},
+    ],
+}
+
+# rendered by the renderer the template shipped before it was compiled into a render plan
+BASELINE_CARD = {
+    "type": "AdaptiveCard",
+    "version": "1.5",
+    "body": [
+        {"type": "TextBlock", "text": "Repairs for Karin", "wrap": True},
+        {"type": "Container", "items": [
+            {"type": "TextBlock", "text": "Oil change (done)", "wrap": True},
+            {"type": "TextBlock", "text": "Tags: [\"car\"]"},
+            {"type": "TextBlock", "text": "First tag: car"},
+            {"type": "Image", "url": "https://example.com/1.png"},
+        ]},
+        {"type": "Container", "items": [
+            {"type": "TextBlock", "text": "Tire (unknown)", "wrap": True},
+            {"type": "TextBlock", "text": "Tags: [\"car\", \"wheel\"]"},
+            {"type": "TextBlock", "text": "First tag: car"},
+        ]},
+        {"type": "Container", "items": [{"type": "TextBlock", "text": "static"}]},
+    ],
+}
+
+
+def test_render_matches_baseline():
+    renderer = AdaptiveCardRenderer(TEMPLATE)
+    assert json.loads(renderer.render(json.dumps(DATA))) == BASELINE_CARD
+    # the compiled plan is reused, and parsed data renders the same as its JSON string
+    assert json.loads(renderer.render(DATA)) == BASELINE_CARD
+
+
+def test_render_of_a_list_matches_baseline():
+    template = json.dumps({"type": "AdaptiveCard", "version": "1.5", "body": [{"type": "TextBlock", "text": "${name}"}]})
+    card = AdaptiveCardRenderer(template).render(json.dumps([{"name": "a"}, {"name": "b"}]))
+    assert json.loads(card)["body"] == [[{"type": "TextBlock", "text": "a"}], [{"type": "TextBlock", "text": "b"}]]
+
+
+def test_invalid_data_renders_the_template():
+    assert AdaptiveCardRenderer(TEMPLATE).render("not json") == TEMPLATE
+
+
+def test_render_within_max_bytes_appends_more_results():
+    data = {
+        "owner": {"name": "Karin"},
+        "items": [{"title": f"Repair {i}", "status": "open", "tags": ["car"], "image": ""} for i in range(200)],
+    }
+    renderer = AdaptiveCardRenderer(TEMPLATE)
+    full = json.loads(renderer.render(data))
+    card_str = renderer.render(data, max_bytes=2048)
+    card = json.loads(card_str)
+
+    assert len(card_str.encode("utf-8")) <= 2048
+    kept = len(card["body"]) - 3
+    assert 0 < kept < 200
+    # the items that fit are rendered as without a budget, the static elements around them are
+    # kept, and the marker counts the items left out
+    assert card["body"][:-1] == full["body"][: kept + 1] + full["body"][-1:]
+    assert card["body"][-1] == {"type": "TextBlock", "text": f"{200 - kept} more results", "isSubtle": True, "wrap": True}
+
+
+def test_static_elements_are_kept_when_no_item_fits():
+    data = {"owner": {"name": "Karin"}, "items": [{"title": "x" * 500, "status": "open", "tags": ["car"], "image": ""}]}
+    card = json.loads(AdaptiveCardRenderer(TEMPLATE).render(data, max_bytes=512))
+    assert card["body"] == [
+        {"type": "TextBlock", "text": "Repairs for Karin", "wrap": True},
+        {"type": "Container", "items": [{"type": "TextBlock", "text": "static"}]},
+        {"type": "TextBlock", "text": "1 more results", "isSubtle": True, "wrap": True},
+    ]
+
+
+def test_render_within_a_large_max_bytes_is_unchanged():
+    renderer = AdaptiveCardRenderer(TEMPLATE)
+    assert json.loads(renderer.render(DATA, max_bytes=64 * 1024)) == BASELINE_CARD
@@ -0,0 +1,39 @@
+import asyncio
+import json
+import os
+
+from lib.asset_registry import AssetRegistry
+
+CARD = {"type": "AdaptiveCard", "version": "1.5", "body": [{"type": "TextBlock", "text": "${id}"}]}
+
+
+def make_registry(tmp_path, check_interval=0.01):
+    cards_dir = tmp_path / "adaptiveCards"
+    cards_dir.mkdir()
+    (cards_dir / "getItem.json").write_text(json.dumps(CARD))
+    (tmp_path / "prompts" / "chat").mkdir(parents=True)
+    return AssetRegistry(str(cards_dir), str(tmp_path / "prompts"), check_interval=check_interval)
+
+
+def test_renderers_are_compiled_when_loaded(tmp_path):
+    registry = make_registry(tmp_path)
+    renderer = registry.get_renderer("getItem")
+    assert renderer._body_plan is not None
+    assert json.loads(renderer.render({"id": 1}))["body"] == [{"type": "TextBlock", "text": "1"}]
+
+
+def test_lookups_do_not_rescan_and_watching_reloads(tmp_path):
+    registry = make_registry(tmp_path)
+    os.remove(tmp_path / "adaptiveCards" / "getItem.json")
+    (tmp_path / "prompts" / "chat" / "actions.json").write_text("[]")
+    assert registry.get_renderer("getItem") is not None
+    assert registry.get_actions("chat") is None
+
+    async def main():
+        registry.start_watching()
+        await asyncio.sleep(0.2)
+        await registry.stop_watching()
+
+    asyncio.run(main())
+    assert registry.get_renderer("getItem") is None
+    assert registry.get_actions("chat") == "[]"
@@ -0,0 +1,53 @@
+import json
+
+from lib.json_stream import JSONStreamParser, JSONStreamReader, StreamedJSONResponse
+
+
+def parse(text: str, max_items=None, chunk_size=3):
+    parser = JSONStreamParser(max_items)
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i : i + chunk_size])
+    parser.close()
+    return parser
+
+
+def test_parses_documents_split_in_small_chunks():
+    document = {"items": [{"name": 'say "hi" \\', "tags": ["a", "b"]}, 1.5e3, True, None], "empty": {}}
+    assert parse(json.dumps(document)).result == document
+
+
+def test_max_items_only_limits_the_top_level_array():
+    document = [{"tags": list(range(5))} for _ in range(5)]
+    parser = JSONStreamParser(max_items=2)
+    parser.feed(json.dumps(document))
+    assert parser.done
+    assert parser.truncated
+    assert parser.result == document[:2]
+
+
+def test_long_string_is_scanned_once():
+    text = json.dumps(["x" * 10000])
+    parser = JSONStreamParser()
+    scanned = []
+    string_end = parser._string_end
+
+    def counting_string_end(buf, pos):
+        scanned.append(len(buf) - pos - 1 - parser._string_scanned)
+        return string_end(buf, pos)
+
+    parser._string_end = counting_string_end
+    for i in range(0, len(text), 100):
+        parser.feed(text[i : i + 100])
+    parser.close()
+    assert parser.result == ["x" * 10000]
+    assert sum(scanned) < 2 * len(text)
+
+
+def test_byte_cutoff_drops_the_partial_object():
+    body = json.dumps([{"id": 1, "name": "first"}, {"id": 2, "name": "second"}]).encode()
+    response = StreamedJSONResponse(200, "OK", {"Content-Type": "application/json"})
+    reader = JSONStreamReader(response, max_bytes=body.index(b'"name": "second"'))
+    assert not reader.feed(body)
+    reader.close()
+    assert response.truncated
+    assert response.data == [{"id": 1, "name": "first"}]
@@ -0,0 +1,44 @@
+import asyncio
+
+from lib.api_batch import ApiBatch
+from lib.request_scheduler import RequestScheduler
+from lib.response_cache import ResponseCache
+from test_requests_openapi import CountingRequestor, make_client
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    scheduler = RequestScheduler()
+    calls = []
+
+    async def send():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        first = asyncio.ensure_future(scheduler.run("key", "host", send))
+        second = asyncio.ensure_future(scheduler.run("key", "host", send))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "result"
+    assert len(calls) == 1
+
+
+def test_timed_out_call_releases_its_host_slot():
+    requestor = CountingRequestor({"id": 1}, delay=2)
+    client = make_client(requestor, cache=ResponseCache())
+    batch = ApiBatch(client, timeout=0.2)
+
+    async def main():
+        batch.add("listRepairs", assignedTo="Karin")
+        results = await batch.execute()
+        semaphore = client.scheduler._host_semaphores["example.com"]
+        return results, semaphore._value
+
+    results, free_slots = asyncio.run(main())
+    assert isinstance(results[0].error, asyncio.TimeoutError)
+    assert free_slots == client.scheduler.max_per_host
+    assert client.scheduler.stats["in_flight"] == 0
+    assert client.cache.stats["entries"] == 0
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import requests
+
+from lib.request_scheduler import RequestScheduler
+from lib.requests_openapi import AsyncRequestor, OpenAPIClient, Requestor
+from lib.response_cache import ResponseCache
+
+SPEC = {
+    "openapi": "3.0.0",
+    "info": {"title": "Repairs", "version": "1.0"},
+    "servers": [{"url": "https://example.com"}],
+    "paths": {
+        "/repairs": {
+            "get": {
+                "operationId": "listRepairs",
+                "parameters": [{"name": "assignedTo", "in": "query", "schema": {"type": "string"}}],
+                "responses": {"200": {"description": "ok"}},
+            }
+        }
+    },
+}
+
+
+class CountingRequestor(AsyncRequestor):
+    def __init__(self, body, delay=0.01):
+        self.body = body
+        self.delay = delay
+        self.calls = 0
+
+    async def request(self, method, url, params={}, headers={}, cookies={}, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = "OK"
+        resp.headers["Content-Type"] = "application/json"
+        resp._content = json.dumps(self.body).encode()
+        return resp
+
+
+def make_client(requestor, cache=None):
+    client = OpenAPIClient(async_requestor=requestor, cache=cache, scheduler=RequestScheduler())
+    client.load_spec(SPEC)
+    return client
+
+
+def test_concurrent_identical_acall_json_calls_make_one_request():
+    requestor = CountingRequestor([{"id": i} for i in range(10)])
+    client = make_client(requestor)
+
+    async def main():
+        return await asyncio.gather(
+            client.operations["listRepairs"].acall_json(assignedTo="Karin", max_items=3),
+            client.operations["listRepairs"].acall_json(assignedTo="Karin", max_items=3),
+        )
+
+    first, second = asyncio.run(main())
+    assert requestor.calls == 1
+    assert first.data == second.data == [{"id": 0}, {"id": 1}, {"id": 2}]
+    assert client.scheduler.stats["coalesced"] == 1
+
+
+def test_acall_json_results_are_cached_per_limits():
+    requestor = CountingRequestor([{"id": i} for i in range(10)], delay=0)
+    client = make_client(requestor, cache=ResponseCache())
+    operation = client.operations["listRepairs"]
+
+    async def main():
+        first = await operation.acall_json(assignedTo="Karin", max_items=3)
+        second = await operation.acall_json(assignedTo="Karin", max_items=3)
+        other = await operation.acall_json(assignedTo="Karin", max_items=5)
+        return first, second, other
+
+    first, second, other = asyncio.run(main())
+    assert requestor.calls == 2
+    assert second is first
+    assert len(other.data) == 5
+    assert first.truncated
+
+
+def test_sync_and_async_calls_do_not_share_cached_responses():
+    async_requestor = CountingRequestor({"via": "async"}, delay=0)
+
+    class SyncRequestor(Requestor):
+        def request(self, method, url, params={}, headers={}, cookies={}, **kwargs):
+            resp = requests.Response()
+            resp.status_code = 200
+            resp._content = b"sync"
+            return resp
+
+    client = OpenAPIClient(requestor=SyncRequestor(), async_requestor=async_requestor, cache=ResponseCache())
+    client.load_spec(SPEC)
+    operation = client.operations["listRepairs"]
+    operation.cache_ttl = 60
+
+    async_resp = asyncio.run(operation.acall(assignedTo="Karin"))
+    assert operation(assignedTo="Karin").content == b"sync"
+    assert asyncio.run(operation.acall(assignedTo="Karin")) is async_resp
+    assert async_requestor.calls == 1
+
+
+def test_s_maxage_is_not_read_as_max_age():
+    assert ResponseCache._parse_cache_control({"Cache-Control": "public, s-maxage=600"}) is None
+    assert ResponseCache._parse_cache_control({"Cache-Control": "s-maxage=600, max-age=5"}) == (5.0, False)
+
+
+def test_close_closes_the_aiohttp_session():
+    client = OpenAPIClient()
+    client.load_spec(SPEC)
+
+    async def main():
+        session = client.async_requestor.session
+        await client.close()
+        return session
+
+    assert asyncio.run(main()).closed
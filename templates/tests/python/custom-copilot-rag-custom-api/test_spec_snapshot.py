@@ -0,0 +1,75 @@
+import json
+import pickle
+
+from lib import spec_snapshot
+
+
+class Builds:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, content: bytes):
+        self.count += 1
+        return {"spec": content.decode()}
+
+
+def write_spec(tmp_path, text="openapi: 3.0.0"):
+    path = tmp_path / "spec.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_snapshot_is_reused_until_the_spec_changes(tmp_path):
+    spec_path = write_spec(tmp_path)
+    build = Builds()
+
+    assert spec_snapshot.load_or_build(spec_path, build) == {"spec": "openapi: 3.0.0"}
+    assert spec_snapshot.load_or_build(spec_path, build) == {"spec": "openapi: 3.0.0"}
+    assert build.count == 1
+
+    write_spec(tmp_path, "openapi: 3.1.0")
+    assert spec_snapshot.load_or_build(spec_path, build) == {"spec": "openapi: 3.1.0"}
+    assert build.count == 2
+
+
+def test_header_is_json_and_checked_before_unpickling(tmp_path, monkeypatch):
+    spec_path = write_spec(tmp_path)
+    spec_snapshot.load_or_build(spec_path, Builds())
+    path = spec_snapshot.snapshot_path(spec_path)
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        body = f.read()
+    assert header["format"] == spec_snapshot.SNAPSHOT_FORMAT
+    assert set(header) == {"format", "versions", "spec_sha256", "data_sha256"}
+
+    # a body that does not match its digest is never unpickled
+    with open(path, "wb") as f:
+        f.write(json.dumps(header).encode() + b"\n" + body[:-1] + b"\x00")
+    loads = []
+    monkeypatch.setattr(spec_snapshot.pickle, "loads", lambda data: loads.append(data))
+    build = Builds()
+    assert spec_snapshot.load_or_build(spec_path, build) == {"spec": "openapi: 3.0.0"}
+    assert build.count == 1
+    assert loads == []
+
+
+def test_snapshot_of_a_previous_format_is_rebuilt(tmp_path):
+    spec_path = write_spec(tmp_path)
+    with open(spec_snapshot.snapshot_path(spec_path), "wb") as f:
+        pickle.dump((1, "digest"), f)
+        pickle.dump({"spec": "stale"}, f)
+    build = Builds()
+    assert spec_snapshot.load_or_build(spec_path, build) == {"spec": "openapi: 3.0.0"}
+    assert build.count == 1
+
+
+def test_snapshot_is_rebuilt_for_other_library_versions(tmp_path, monkeypatch):
+    spec_path = write_spec(tmp_path)
+    build = Builds()
+    spec_snapshot.load_or_build(spec_path, build)
+
+    versions = dict(spec_snapshot._versions(), pydantic="0.0.1")
+    monkeypatch.setattr(spec_snapshot, "_versions", lambda: versions)
+    spec_snapshot.load_or_build(spec_path, build)
+    spec_snapshot.load_or_build(spec_path, build)
+    assert build.count == 2
@@ -0,0 +1,98 @@
+import asyncio
+import glob
+import os
+
+import pytest
+from botbuilder.core import StoreItem
+from teams.ai.prompts import Message
+
+import sqlite_storage
+from sqlite_storage import SqliteStorage
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_items_round_trip_across_restarts(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def write():
+        storage = SqliteStorage(path)
+        await storage.write({"conversation": {"history": [Message(role="user", content="hi")]}, "user": StoreItem(n=1)})
+        await storage.close()
+
+    async def read():
+        storage = SqliteStorage(path)
+        items = await storage.read(["conversation", "user", "missing"])
+        await storage.close()
+        return items
+
+    run(write())
+    items = run(read())
+    assert set(items) == {"conversation", "user"}
+    assert items["conversation"]["history"] == [Message(role="user", content="hi")]
+    assert items["conversation"]["e_tag"]
+    assert items["user"].n == 1
+
+
+def test_read_items_are_copies(tmp_path):
+    async def main():
+        storage = SqliteStorage(str(tmp_path / "state.db"))
+        await storage.write({"conversation": {"history": ["hi"]}})
+        (await storage.read(["conversation"]))["conversation"]["history"].append("changed")
+        items = await storage.read(["conversation"])
+        await storage.close()
+        return items
+
+    assert run(main())["conversation"]["history"] == ["hi"]
+
+
+def test_write_with_a_stale_e_tag_is_rejected(tmp_path):
+    async def main():
+        storage = SqliteStorage(str(tmp_path / "state.db"))
+        await storage.write({"conversation": {"count": 1}})
+        first = (await storage.read(["conversation"]))["conversation"]
+        await storage.write({"conversation": {**first, "count": 2}})
+        with pytest.raises(KeyError, match="Etag conflict"):
+            await storage.write({"conversation": {**first, "count": 3}})
+        await storage.write({"conversation": {"count": 4, "e_tag": "*"}})
+        items = await storage.read(["conversation"])
+        await storage.close()
+        return items
+
+    assert run(main())["conversation"]["count"] == 4
+
+
+def test_concurrent_writes_get_their_own_result(tmp_path):
+    async def main():
+        storage = SqliteStorage(str(tmp_path / "state.db"))
+        await storage.write({"conversation": {"count": 1}})
+        stale = (await storage.read(["conversation"]))["conversation"]
+        await storage.write({"conversation": {**stale, "count": 2}})
+        results = await asyncio.gather(
+            *(storage.write({f"user{i}": {"i": i}}) for i in range(20)),
+            storage.write({"conversation": stale}),
+            return_exceptions=True,
+        )
+        await storage.delete(["user0"])
+        items = await storage.read([f"user{i}" for i in range(20)])
+        await storage.close()
+        return results, items
+
+    results, items = run(main())
+    assert results[:20] == [None] * 20
+    assert isinstance(results[20], KeyError)
+    assert len(items) == 19
+
+
+def test_every_template_has_the_same_copy():
+    # sqlite_storage.py is copied into each python template and only tested here
+    templates_dir = os.path.join(os.path.dirname(sqlite_storage.__file__), "..", "..")
+    copies = glob.glob(os.path.join(templates_dir, "*", "src", "sqlite_storage.py"))
+    assert len(copies) == 6
+    with open(sqlite_storage.__file__, "rb") as f:
+        tested = f.read()
+    for copy in copies:
+        with open(copy, "rb") as f:
+            assert f.read() == tested, copy
@@ -0,0 +1,105 @@
+import asyncio
+
+from botbuilder.core import MemoryStorage, TurnContext
+from botbuilder.schema import Activity, ChannelAccount, ConversationAccount
+
+from sqlite_storage import SqliteStorage
+from state import AppTurnState
+
+CONVERSATION_KEY = "msteams/bot/conversations/c1"
+USER_KEY = "msteams/bot/users/u1"
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    async def read(self, keys, **kwargs):
+        self.calls.append(("read", sorted(keys)))
+        return await super().read(keys)
+
+    async def write(self, changes):
+        self.calls.append(("write", sorted(changes)))
+        return await super().write(changes)
+
+    async def delete(self, keys):
+        self.calls.append(("delete", sorted(keys)))
+        return await super().delete(keys)
+
+
+def new_context():
+    activity = Activity(
+        type="message",
+        channel_id="msteams",
+        text="hi",
+        conversation=ConversationAccount(id="c1"),
+        recipient=ChannelAccount(id="bot"),
+        from_property=ChannelAccount(id="u1"),
+    )
+    return TurnContext(object(), activity)
+
+
+async def run_turn(storage, change=None):
+    context = new_context()
+    # the application loads the state through the factory, then loads it again
+    state = await AppTurnState.load(context, storage)
+    state = await state.load(context, storage)
+    state.temp.input = "hi"
+    if change:
+        change(state)
+    await state.save(context, storage)
+    return state
+
+
+def test_turn_reads_every_scope_at_once():
+    storage = CountingStorage()
+    asyncio.run(run_turn(storage))
+    assert storage.calls[0] == ("read", sorted([CONVERSATION_KEY, USER_KEY]))
+    assert [call for call, _ in storage.calls].count("read") == 1
+
+
+def test_only_changed_scopes_are_written():
+    storage = CountingStorage()
+    asyncio.run(run_turn(storage, lambda state: state.conversation.__setitem__("count", 1)))
+    assert storage.calls[1:] == [("write", [CONVERSATION_KEY])]
+
+    storage.calls = []
+    asyncio.run(run_turn(storage))
+    assert storage.calls == [("read", sorted([CONVERSATION_KEY, USER_KEY]))]
+
+    storage.calls = []
+    state = asyncio.run(run_turn(storage, lambda state: state.user.__setitem__("name", "Karin")))
+    assert storage.calls[1:] == [("write", [USER_KEY])]
+    assert state.conversation["count"] == 1
+
+
+def test_state_round_trips_through_storage():
+    storage = CountingStorage()
+    asyncio.run(run_turn(storage, lambda state: state.conversation.__setitem__("count", 1)))
+    asyncio.run(run_turn(storage, lambda state: state.conversation.__setitem__("count", state.conversation["count"] + 1)))
+    state = asyncio.run(run_turn(storage))
+    assert state.conversation["count"] == 2
+
+
+def test_deleted_scopes_are_deleted_in_one_call():
+    storage = CountingStorage()
+    asyncio.run(run_turn(storage, lambda state: state.conversation.__setitem__("count", 1)))
+    storage.calls = []
+    asyncio.run(run_turn(storage, lambda state: state.__delitem__("conversation")))
+    assert ("delete", [CONVERSATION_KEY]) in storage.calls
+    assert [call for call, _ in storage.calls].count("delete") == 1
+
+
+def test_state_round_trips_through_sqlite_storage(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def turn(change=None):
+        storage = SqliteStorage(path)
+        state = await run_turn(storage, change)
+        await storage.close()
+        return state
+
+    asyncio.run(turn(lambda state: state.conversation.__setitem__("count", 1)))
+    asyncio.run(turn(lambda state: state.conversation.__setitem__("count", state.conversation["count"] + 1)))
+    assert asyncio.run(turn()).conversation["count"] == 2
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the tests of a template live outside of it, so they are not shipped in the scaffolded projects
+TEMPLATE_DIR = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "python", TEMPLATE_DIR, "src"))
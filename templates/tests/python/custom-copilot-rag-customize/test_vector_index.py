@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def test_index_round_trip(tmp_path):
+    path = str(tmp_path / "chunks")
+    index = VectorIndex(3)
+    index.add(["a", "b"], [[1, 0, 0], [0, 1, 0]])
+    index.save(path)
+
+    loaded = VectorIndex.load(path)
+    assert loaded.ids == ["a", "b"]
+    assert [id for id, _ in loaded.search([0.9, 0.1, 0], top_k=2)] == ["a", "b"]
+
+
+def test_loaded_index_can_be_saved_again(tmp_path):
+    path = str(tmp_path / "chunks")
+    index = VectorIndex(3)
+    index.add(["a", "b"], [[1, 0, 0], [0, 1, 0]])
+    index.save(path)
+
+    # the loaded matrix is memory-mapped: saving must not replace the mapped file
+    loaded = VectorIndex.load(path)
+    assert isinstance(loaded._matrix, np.memmap)
+    loaded.save(path)
+    loaded.add(["c"], [[0, 0, 1]])
+    loaded.save(path)
+
+    reloaded = VectorIndex.load(path)
+    assert reloaded.ids == ["a", "b", "c"]
+    assert reloaded.search([0, 0, 1], top_k=1)[0][0] == "c"
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".npy")]) == 1
+
+
+def test_batches_grow_the_matrix_buffer_in_place():
+    index = VectorIndex(2)
+    index.build_approximate()
+    index.add(["a"], [[1, 0]])
+    index.build_approximate(n_lists=1)
+    buffers = set()
+    for i in range(100):
+        index.add([f"id{i}"], [[i % 2, 1]])
+        buffers.add(id(index._matrix_buffer))
+
+    # a handful of reallocations instead of one copy of the whole matrix per batch
+    assert len(buffers) <= 3
+    assert len(index) == 101
+    assert index.search([1, 0], top_k=1)[0][0] == "a"
+    index.remove(["a"])
+    assert index.search([1, 0], top_k=1)[0][0] != "a"